@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.vectorstores.faiss import dependable_faiss_import
+
+from embedding_cache import normalize_text
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2048"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Two-tier cache of chat answers, stored as whatever object the caller puts. The first
+# tier matches the normalized question exactly; the second embeds the question and
+# looks for a past question whose cosine similarity is at least `threshold` in a small
+# inner-product index. Entries carry the corpus version they were answered against and
+# the cache empties itself when the version changes.
+class AnswerCache:
+    def __init__(self, embeddings: Optional[Embeddings] = None, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl: float = ANSWER_CACHE_TTL, threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.version = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        # (normalized question, scope) -> (entry id, answer, created)
+        self._entries = OrderedDict()
+        self._keys_by_id = {}
+        self._next_id = 0
+        self._index = None
+
+    def _key(self, question: str, scope: Hashable) -> tuple:
+        return normalize_text(question).lower(), scope
+
+    def _sync_version(self, version: Hashable) -> None:
+        if version != self.version:
+            self._clear()
+            self.version = version
+
+    def _remove(self, key: tuple) -> None:
+        entry_id = self._entries.pop(key)[0]
+        del self._keys_by_id[entry_id]
+        if self._index is not None:
+            self._index.remove_ids(np.array([entry_id], dtype=np.int64))
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        if self.embeddings is None or self.threshold > 1:
+            return None
+        vector = np.array([self.embeddings.embed_query(question)], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    # semantic=False skips the embedding tier, so a lookup never calls the embedder
+    def get(self, question: str, version: Hashable, scope: Hashable = None, semantic: bool = True) -> Optional[Any]:
+        key = self._key(question, scope)
+        with self._lock:
+            self._sync_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[2]):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry[1]
+            if not semantic or self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+
+        vector = self._embed(question)
+        with self._lock:
+            if vector is None or version != self.version or self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+            scores, ids = self._index.search(vector, min(4, self._index.ntotal))
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id == -1 or score < self.threshold:
+                    break
+                match = self._keys_by_id.get(int(entry_id))
+                if match is None or match[1] != scope:
+                    continue
+                if self._expired(self._entries[match][2]):
+                    self._remove(match)
+                    continue
+                self._entries.move_to_end(match)
+                self.semantic_hits += 1
+                return self._entries[match][1]
+            self.misses += 1
+            return None
+
+    def put(self, question: str, version: Hashable, answer: Any, scope: Hashable = None, semantic: bool = True) -> None:
+        key = self._key(question, scope)
+        vector = self._embed(question) if semantic else None
+        with self._lock:
+            self._sync_version(version)
+            if key in self._entries:
+                self._remove(key)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[key] = (entry_id, answer, time.time())
+            self._keys_by_id[entry_id] = key
+            if vector is not None:
+                if self._index is None:
+                    faiss = dependable_faiss_import()
+                    self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+                self._index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "version": self.version,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
@@ -1,18 +1,35 @@
-import tempfile
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import os
+import time
+from typing import List, Literal, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from langchain.document_loaders.csv_loader import CSVLoader
-from langchain.vectorstores import FAISS
-from langchain.embeddings.openai import OpenAIEmbeddings
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, conint
 from langchain.prompts import PromptTemplate
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import LLMChain
+from langchain.schema import HumanMessage
 from dotenv import load_dotenv
+import index_store
+import ingest
+import tracing
+from embedding_cache import get_embeddings
+from llm_pool import LLMPool, QueueFull
+from answer_cache import AnswerCache
+from context_packer import ContextPacker, count_tokens
+from lexical_index import reciprocal_rank_fusion
+from scorecards import TOPIC_NAMES, build_from_store
+from streaming import LatencyRecorder, sse_answer, sse_known_answer
 
 load_dotenv()
 
+# Shared embedder, backed by the on-disk embedding cache
+embeddings = get_embeddings()
+
 app = FastAPI()
+tracing.instrument(app)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,35 +39,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Declare the vector_store as a global variable
-vector_store = None
+# Per-process handle on the active corpus, reloaded when another worker switches corpus.
+# It is replaced as a whole, never updated in place.
+corpus: Optional[index_store.Corpus] = None
+
+# Number of rows retrieved per question, and how they are retrieved: "hybrid" fuses
+# BM25 and vector rankings, "vector" and "lexical" use one of them alone. Lexical
+# retrieval never calls the embedding API. A request may ask for at most RETRIEVAL_MAX_K rows.
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "50"))
+RETRIEVAL_K = min(max(1, int(os.getenv("RETRIEVAL_K", "3"))), RETRIEVAL_MAX_K)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+if RETRIEVAL_MODE not in RETRIEVAL_MODES:
+    raise ValueError(f"RETRIEVAL_MODE must be one of {', '.join(RETRIEVAL_MODES)}, got {RETRIEVAL_MODE!r}")
 
 class QueryRequest(BaseModel):
     question: str
+    # Optional scope; when leader is omitted, leaders named in the question are used
+    leader: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    k: Optional[conint(gt=0, le=RETRIEVAL_MAX_K)] = None
+    mode: Optional[Literal["hybrid", "vector", "lexical"]] = None
 
 class QueryResponse(BaseModel):
     response: str
+    # Token usage of the packed prompt against the old whole-charter prompt; None for cached answers
+    context: Optional[dict] = None
 
-# Process uploaded csv file
-def process_document(file: UploadFile): 
-    with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-        tmp_file.write(file.file.read())
-        tmp_file_path = tmp_file.name
+# Return the active corpus, mapping it from disk if this worker has not loaded it yet.
+# Requests keep the bundle they got here for their whole lifetime.
+def get_corpus() -> Optional[index_store.Corpus]:
+    global corpus
+    key = index_store.get_current()
+    if key is None:
+        return None
+    current = corpus
+    if current is None or current.key != key:
+        current = corpus = index_store.load_corpus(key, embeddings)
+    return current
 
-    loader = CSVLoader(file_path=tmp_file_path, encoding="utf-8", csv_args={'delimiter': ','})
-    document = loader.load()
-    return document
+# Compressed instructions sent with each question instead of the full charter
+PREAMBLE = """
+The CSV rows below are scraped tweets from the twitter accounts of political leaders. They are used by Know Your Leader, a tool that tells the public and journalists where political figures stand on election issues such as the economy, social issues and foreign policy.
+Answer questions like "What has X said about Y?", "How consistent has X been on Y?" and "How similar is X to Z?" using ONLY the rows provided. Do not speculate or misrepresent a candidate; if the rows do not cover the question, say so.
+Provide references for every tweet you use to generate each of your responses, in the form: [Tweet text] - [Date of Tweet] by [Leader's Name].
+"""
 
 # Initialize and return a chat bot
 def init_chat_bot():
     llm = ChatOpenAI(temperature=0, model="gpt-4o")
 
-    template = """
-    The data provided in the csv files contains scraped tweets from twitter accounts of political leaders across the world. We want to use this data to build a tool that tells the public about the stance of these political figures on different issues. I will be asking you certain questions based on their positions on different issues and i expect you to use the data provided only to give me responses. Please find the project scope below:
-Know your leader Project charter and scope statement Last updated:May 23, 2024 Introduction 2024 is set to be the biggest election in history with national elections being held in more than 60 countries totaling half of the world’s population. One of the most important aspects of any election is understanding where a candidate stands on a variety of issues. This means not only looking at what they’re promising but rather what their track record says about the positions on a variety of topics such as on the economy, social issues, foreign policy and more. Objective Know Your Leader will be an AI powered chatbot that will allow the public and journalists to check political speech. We will allow the public to ask questions such as “What has X person said about Y topic in the past?” The data will come from different sources to most accurately represent a candidate's position. By scouring video interviews, press releases, social media posts, news articles and PDF transcripts of their statements in Congress the platform will then extract all instances of what a person has said, how consistently they’ve said it, or perhaps most interestingly what they’ve not said about a particular topic. This will allow us to present a dynamic analysis of their changing viewpoints over time. Beyond elections, this platform could also help journalists, researchers, or the greater public gauge which public figures have been consistent with their messaging and values, who has spoken up, and who has remained silent. Scope The core of this project is to offer the public and journalists an easy-to-use platform to check political speech. Our ultimate goal is to build a generative artificial intelligence model with open-source technology that allows us to hold political leaders or public figures accountable for what they say in the public media. Administrators will have the ability to easily adapt the model for any kind of leader, by providing the information needed. We are aiming to use and refine the platform by applying it to some of the major upcoming presidential elections starting with South Africa, the UK, the US elections and beyond. While the goal is to be able to profile potentially dozens of candidates including local leaders, if we just focus on the presidential candidates we could still provide a lot of value to hundreds of millions of readers in several countries around the world. The minimum output we want to reach by the end of the year is an application that checks political speech for the US presidential candidates - likely between Joe Biden and Donald Trump. Our goal is to democratize access to political accountability, making it easier for citizens and journalists alike to fact-check and understand the politician's view about certain topics over the years. This project stands at the intersection of technology, journalism, and civic empowerment, harnessing the potential of generative AI to encourage our audience to be more informed and engaged with the news. ● End users: AI will be used to enhance the process for these two primary users Journalist - Anyone who wants to ‘generate’ a package for any upcoming election. User - Anyone who interacts with the page to learn about elections. Human resources ● AI mentor - 8 hours of consultation Timeline May - South Africa elections POC June - Data gathering July - UK elections POC August - Development September - Development October - Development November - US elections - main deliverable Budget ● TBD PART II - Editorial requirements Functional requirements Seven general categories divided by user journey: Category 1, 2 and 3 are all general knowledge to set the scene as a starter pack Category 4, 5 and 6 are the backbone of the experience as know your leader Category 7 are the user engagement features as get me involved Category Description [starter pack] South Africa elections at a glance Basic stats about the election so that people can familiarise themselves with the overall process. Journalist - Generate a prompt that spits out information for the following: Election day Country population Registered voters Voting age Time is polling Provinces/states Municipalities/constituencies Polling stations Presidential term Limit of terms Type of system E.g. Journalist types in: Generate Ghana elections at a glance Output 1: data of all these values Output 2: infographic of all these values User - Guide the user through these basic stats. Could be: What do I need to know about the South African elections? ARROWS - tell me more | tell me less [starter pack] What are the main election issues? Journalist - Generate a prompt that spits out information for the following: Top 20 election issues unique to that country E.g. Journalist types in: Generate Ghana elections main issues Output 1: data of all these values Output 2: infographic of all these values User - Guide the user through the basic election issues. Could be: What are the main election issues in South Africa? ARROWS - tell me more | tell me less [starter pack] Who are the candidates? Journalist - Generate a prompt that spits out information for the following: List out all the main candidates in the elections E.g. Journalist types in: Generate Ghana elections main candidates User - Guide the user through the list of candidates. Could be: Who are the main candidates? ARROWS - tell me more | tell me less Generate South Africa elections starter pack [know your leader] What is each leader’s position on X? Journalist - Generate a prompt that spits out information for the following: List of each candidate and their positions on all the main election issues. User - E.g. User types in: What is Jacob Zuma’s position on the economy? ARROWS - tell me more | tell me less [know your leader] How consistent has my candidate been on X? Journalist - Generate a prompt that spits out information for the following: How consistent has X candidate been on Y issue? User - E.g. User types in: Generate Jacob Zuma’s consistency scorecard on immigration ARROWS - tell me more | tell me less [know your leader] Who is most similar to my leader? Journalist - Generate a prompt that spits out information for the following: How similar is this leader to this other leader? User - E.g. User given the option to: Generate Jacob Zuma’s and Julius Malema similarity scorecard ARROWS - tell me more | tell me less Generate South Africa elections know your leader [get me involved] Who should I vote for? Might be a really valuable feature to then give readers some suggestion based on some principles they have Generate South Africa elections get me involved Story principles REUSABLE - The experience should be easy to replicate for any election SIMPLICITY - Users should never feel overwhelmed in the decisions they have to take JOURNEY - Users need to know what questions to ask. The experience should be a journey to get them to better understand their country’s election and their leaders. ENGAGEMENT - The experience should be very engaging by being very visual, interactive and never leave the reader with the question “What am I supposed to do next?” SHARABLE - The experience should allow people to share infographics or charts about their candidate on social media Editorial risk assessment and mitigation steps Risk Mitigation Incomplete data Utilise existing content from multiple LLMs Hallucination or misrepresenting a candidate Fields should not be totally open ended, rather they should focus solely on major election issues. Users should be told that upfront. Prompt injection Industry best practices Source of the data should be visible.
-I want you to use the data provided in the file ONLY to generate responses and I want you to provide references of the tweets that you are using to generate  each of your responses
-
-
+    template = PREAMBLE + """
 Here is the user question;
 {question}
 
@@ -65,41 +105,270 @@ Here are the CSV;
     chat_bot = LLMChain(llm=llm, prompt=prompt)
     return chat_bot
 
-# Query Vector Store similar embeddings
-def query_store(query: str, store: FAISS):
-    response = store.similarity_search(query, k=3)
-    contents = [doc.page_content for doc in response]
+# Query Vector Store similar embeddings, fused with BM25 matches in hybrid mode
+def query_store(query: str, corpus: index_store.Corpus, ids: Optional[np.ndarray] = None, k: int = RETRIEVAL_K,
+                mode: str = RETRIEVAL_MODE):
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}")
+    if k <= 0:
+        return []
+    store = corpus.vectors
+    if corpus.lexical is None:
+        mode = "vector"
+    if mode == "vector":
+        positions = index_store.vector_search(store, query, k, ids)
+    elif mode == "lexical":
+        with tracing.stage("bm25_search"):
+            positions = corpus.lexical.search(query, k, ids)
+    else:
+        # Fuse deeper rankings than we keep so rows ranked well by both come first
+        depth = k * 4
+        vector_positions = index_store.vector_search(store, query, depth, ids)
+        with tracing.stage("bm25_search"):
+            lexical_positions = corpus.lexical.search(query, depth, ids)
+        positions = reciprocal_rank_fusion([vector_positions, lexical_positions])[:k]
+    contents = [doc.page_content for doc in index_store.documents(store, positions)]
     return contents
 
+# Narrow the search to the rows of the requested leaders and dates using the metadata index
+# Usernames a question is scoped to: the explicit leader, else leaders named in the question
+def resolve_usernames(corpus: index_store.Corpus, question: str, leader: Optional[str] = None) -> Tuple[str, ...]:
+    usernames = corpus.metadata.match_usernames(leader or question)
+    if leader and not usernames:
+        raise HTTPException(status_code=404, detail=f"No tweets found for leader {leader!r}")
+    return tuple(sorted(usernames))
+
+def candidate_ids(corpus: index_store.Corpus, usernames: Sequence[str], date_from: Optional[str] = None,
+                  date_to: Optional[str] = None) -> Optional[np.ndarray]:
+    return corpus.metadata.select(usernames=list(usernames), date_from=date_from, date_to=date_to)
+
+# Retrieve the rows for a question and pack them into the token budget
+def retrieve_context(question: str, corpus: index_store.Corpus, ids: Optional[np.ndarray] = None,
+                     k: int = RETRIEVAL_K, mode: str = RETRIEVAL_MODE):
+    ideas = query_store(question, corpus, ids, k, mode)
+    with tracing.stage("prompt_assembly"):
+        packed, used = context_packer.fit(ideas, context_packer.budget - PREAMBLE_TOKENS)
+        question_tokens = count_tokens(question)
+        baseline = CHARTER_TOKENS + question_tokens + sum(count_tokens(idea) for idea in ideas)
+        report = context_packer.report(baseline, PREAMBLE_TOKENS + question_tokens + used, len(packed), len(ideas))
+    return packed, report
+
+# What the answer cache stores: the answer with the rows and context report it was
+# built from, so a cached answer replays the same events as a fresh one
+class CachedAnswer(NamedTuple):
+    response: str
+    references: List[str]
+    context: dict
+
+# Sent instead of calling the LLM when the filters leave no rows to answer from
+NO_ROWS_ANSWER = "No tweets match this question's leader and date filters."
+
 # Queries the chat bot for a response
-def query_chat_bot(question: str, vector_store: FAISS):
-    ideas = query_store(question, vector_store)
-    chat_bot = init_chat_bot()
-    response = chat_bot.run(question=question, ideas=ideas)
-    return response
+def query_chat_bot(question: str, corpus: index_store.Corpus, ids: Optional[np.ndarray] = None,
+                   k: int = RETRIEVAL_K, mode: str = RETRIEVAL_MODE):
+    packed, report = retrieve_context(question, corpus, ids, k, mode)
+    if not packed:
+        return CachedAnswer(NO_ROWS_ANSWER, packed, report)
+    with tracing.stage("llm"):
+        response = chat_bot.run(question=question, csv="\n\n".join(packed))
+    tracing.record_tokens(report["context_tokens"], count_tokens(response))
+    return CachedAnswer(response, packed, report)
+
+# The chat bot is built once and shared; blocking calls to it go through the pool
+chat_bot = init_chat_bot()
+llm_pool = LLMPool()
+
+# Streaming answers use their own client with token streaming enabled
+streaming_llm = ChatOpenAI(temperature=0, model="gpt-4o", streaming=True)
+time_to_first_token = LatencyRecorder()
+
+# Retrieved rows are packed into the prompt within CONTEXT_TOKEN_BUDGET
+context_packer = ContextPacker()
+# Full project charter the prompt used to carry on every question. Only its token count
+# is kept, as the baseline for the per-request token savings report.
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "project_charter.txt"), encoding="utf-8") as f:
+    CHARTER_TOKENS = count_tokens(f.read())
+PREAMBLE_TOKENS = count_tokens(PREAMBLE)
+
+# Answers are cached per corpus version; question embeddings come from the embedding cache
+answer_cache = AnswerCache(embeddings)
 
 @app.post("/upload-csv/")
-async def upload_csv(file: UploadFile = File(...)):
-    global vector_store
+async def upload_csv(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     try:
-        document = process_document(file)
-        embeddings = OpenAIEmbeddings()
-        vector_store = FAISS.from_documents(document, embeddings)
-        return {"message": "File processed and vector store created successfully"}
+        tmp_file_path, key = await ingest.save_upload(file)
+        if index_store.has_index(key):
+            os.remove(tmp_file_path)
+            index_store.set_current(key)
+            return {"message": "File already processed, reusing stored vector store", "index": key}
+        job = ingest.create_job(key, tmp_file_path)
+        background_tasks.add_task(ingest.run_ingest, job, tmp_file_path, embeddings)
+        return {"message": "File received, ingestion started", "index": key, "job_id": job["job_id"]}
     except Exception as e:
+        tracing.record_error("upload", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/upload-csv/{job_id}")
+async def upload_status(job_id: str):
+    job = ingest.read_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job")
+    return job
+
 @app.post("/query/", response_model=QueryResponse)
 async def query(request: QueryRequest):
-    global vector_store
     try:
-        if vector_store is None:
+        corpus = get_corpus()
+        if corpus is None:
             raise HTTPException(status_code=400, detail="Vector store not initialized. Upload a CSV file first.")
-        response = query_chat_bot(request.question, vector_store)
-        return QueryResponse(response=response)
+        version = corpus.key
+        k, mode = request.k or RETRIEVAL_K, request.mode or RETRIEVAL_MODE
+        usernames = resolve_usernames(corpus, request.question, request.leader)
+        # Inferred leaders are part of the scope so a cached answer never crosses leaders
+        scope = (usernames, request.date_from, request.date_to, k, mode)
+        semantic = mode != "lexical"
+        cached = await run_in_threadpool(answer_cache.get, request.question, version, scope, semantic)
+        if cached is not None:
+            return QueryResponse(response=cached.response)
+
+        ids = candidate_ids(corpus, usernames, request.date_from, request.date_to)
+        key = (" ".join(request.question.lower().split()), scope, version)
+        answer = await llm_pool.run(key, query_chat_bot, request.question, corpus, ids, k, mode)
+        await run_in_threadpool(answer_cache.put, request.question, version, answer, scope, semantic)
+        return QueryResponse(response=answer.response, context=answer.context)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
+        tracing.record_error("query", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Stream the answer as server-sent events: a "references" event with the retrieved
+# tweets, then "token" events, then "done" with the time to first token
+@app.post("/query/stream/")
+async def query_stream(request: QueryRequest):
+    started = time.perf_counter()
+    try:
+        corpus = get_corpus()
+        if corpus is None:
+            raise HTTPException(status_code=400, detail="Vector store not initialized. Upload a CSV file first.")
+        if llm_pool.full():
+            raise HTTPException(status_code=429, detail="Too many requests in flight, try again shortly")
+
+        version = corpus.key
+        k, mode = request.k or RETRIEVAL_K, request.mode or RETRIEVAL_MODE
+        usernames = resolve_usernames(corpus, request.question, request.leader)
+        scope = (usernames, request.date_from, request.date_to, k, mode)
+        semantic = mode != "lexical"
+        cached = await run_in_threadpool(answer_cache.get, request.question, version, scope, semantic)
+        if cached is not None:
+            events = sse_known_answer(cached.response, time_to_first_token, started,
+                                      [("references", {"references": cached.references, "context": cached.context})],
+                                      cached=True)
+            return StreamingResponse(events, media_type="text/event-stream")
+
+        ids = candidate_ids(corpus, usernames, request.date_from, request.date_to)
+        packed, report = await run_in_threadpool(retrieve_context, request.question, corpus, ids, k, mode)
+        if not packed:
+            events = sse_known_answer(NO_ROWS_ANSWER, time_to_first_token, started,
+                                      [("references", {"references": packed, "context": report})])
+            return StreamingResponse(events, media_type="text/event-stream")
+        messages = [HumanMessage(content=chat_bot.prompt.format(question=request.question, csv="\n\n".join(packed)))]
+    except HTTPException:
+        raise
+    except Exception as e:
+        tracing.record_error("query_stream", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    events = sse_answer(
+        streaming_llm, messages, llm_pool, time_to_first_token, started,
+        early_events=[("references", {"references": packed, "context": report})],
+        on_complete=lambda answer: answer_cache.put(request.question, version, CachedAnswer(answer, packed, report),
+                                                    scope, semantic),
+    )
+    return StreamingResponse(events, media_type="text/event-stream")
+
+# Leader scorecards are precomputed at ingest, so these endpoints only read the stored
+# sums and similarity matrix and never call the LLM or the embedding API
+def get_scorecards(leader: str, topic: str):
+    corpus = get_corpus()
+    if corpus is None:
+        raise HTTPException(status_code=400, detail="Vector store not initialized. Upload a CSV file first.")
+    scorecards = corpus.scorecards
+    if scorecards is None:
+        raise HTTPException(status_code=404, detail="Scorecards not built for this corpus. POST /scorecards/rebuild/ first.")
+    if topic not in TOPIC_NAMES:
+        raise HTTPException(status_code=400, detail=f"Unknown topic, expected one of: {', '.join(TOPIC_NAMES)}")
+    position = scorecards.leader(leader)
+    if position is None:
+        raise HTTPException(status_code=404, detail=f"No tweets found for leader {leader!r}")
+    return scorecards, position, scorecards.topic(topic)
+
+@app.get("/scorecards/similarity/")
+async def similarity_scorecard(leader: str, topic: str = "all", limit: int = 5):
+    scorecards, position, topic_id = get_scorecards(leader, topic)
+    return {
+        "leader": scorecards.leaders[position],
+        "topic": topic,
+        "similar": scorecards.most_similar(position, topic_id, limit),
+    }
+
+@app.get("/scorecards/consistency/")
+async def consistency_scorecard(leader: str, topic: str = "all"):
+    scorecards, position, topic_id = get_scorecards(leader, topic)
+    return {"leader": scorecards.leaders[position], "topic": topic, **scorecards.consistency(position, topic_id)}
+
+# Batch job for corpora indexed before scorecards existed: recompute them from the
+# vectors already in the stored index
+def rebuild_scorecards(rebuilt: index_store.Corpus) -> None:
+    global corpus
+    scorecards = build_from_store(rebuilt.vectors)
+    index_store.save_scorecards(rebuilt.key, scorecards)
+    current = corpus
+    if current is not None and current.key == rebuilt.key:
+        corpus = current._replace(scorecards=scorecards)
+
+@app.post("/scorecards/rebuild/")
+async def scorecards_rebuild(background_tasks: BackgroundTasks):
+    corpus = get_corpus()
+    if corpus is None:
+        raise HTTPException(status_code=400, detail="Vector store not initialized. Upload a CSV file first.")
+    background_tasks.add_task(rebuild_scorecards, corpus)
+    return {"message": "Scorecard rebuild started", "index": corpus.key}
+
+# Cache hit counts and the size of the active index, read from existing state at scrape time
+def cache_counts():
+    answers, embedded = answer_cache.stats(), embeddings.stats()
+    return {
+        ("answers", "exact_hit"): answers["exact_hits"],
+        ("answers", "semantic_hit"): answers["semantic_hits"],
+        ("answers", "miss"): answers["misses"],
+        ("embeddings", "hit"): embedded["hits"],
+        ("embeddings", "miss"): embedded["misses"],
+    }
+
+def index_size():
+    current = corpus
+    if current is None:
+        return {}
+    path = index_store.index_path(current.key)
+    size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return {("vectors",): len(current.vectors), ("bytes",): size}
+
+tracing.collect("kyl_cache_requests_total", "Cache lookups by cache and result", cache_counts,
+                ["cache", "result"], kind="counter")
+tracing.collect("kyl_index_size", "Rows and bytes on disk of the active index", index_size, ["unit"])
+
+@app.get("/cache-stats/")
+async def cache_stats():
+    return {
+        "answers": answer_cache.stats(),
+        "embeddings": embeddings.stats(),
+        "llm_pool": llm_pool.stats(),
+        "time_to_first_token": time_to_first_token.summary(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,9 +1,17 @@
 from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts.chat import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from dotenv import load_dotenv
+import hashlib
 import os
+import time
+import tracing
+from llm_pool import LLMPool, QueueFull
+from context_packer import ContextPacker, count_tokens
+from embedding_cache import get_embeddings
+from streaming import LatencyRecorder, sse_answer
 
 # Load environment variables
 load_dotenv()
@@ -13,28 +21,84 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 
 # Initialize ChatOpenAI with the API key
 llm = ChatOpenAI(temperature=0, openai_api_key=openai_api_key, model="gpt-4o")
+streaming_llm = ChatOpenAI(temperature=0, openai_api_key=openai_api_key, model="gpt-4o", streaming=True)
+time_to_first_token = LatencyRecorder()
+
+# Blocking chat calls run on a bounded pool; identical concurrent requests share one call
+llm_pool = LLMPool()
 
 app = FastAPI()
+tracing.instrument(app)
+
+# Create a prompt template for the chat model
+system_template = "You are an assistant that provides information based on the given {document}"
+system_message = SystemMessagePromptTemplate.from_template(system_template)
+human_message = HumanMessagePromptTemplate.from_template("{prompt}")
+
+chat_prompt = ChatPromptTemplate.from_messages([system_message, human_message])
+
+# Documents are chunked once per content hash and only the chunks most relevant to
+# the question are sent, within CONTEXT_TOKEN_BUDGET
+context_packer = ContextPacker(get_embeddings())
+
+# Build the chat messages from the chunks of the document relevant to the prompt
+def build_messages(document_text, prompt):
+    # Includes ranking the chunks, so chunk embedding time is also counted under "embedding"
+    with tracing.stage("prompt_assembly"):
+        context, report = context_packer.pack(prompt, document_text, preamble=system_template)
+        messages = chat_prompt.format_prompt(document=context, prompt=prompt).to_messages()
+    return messages, context, report
 
 def chat_with_document(document_text, prompt):
     try:
-        # Create a prompt template for the chat model
-        system_message = SystemMessagePromptTemplate.from_template("You are an assistant that provides information based on the given {document}")
-        human_message = HumanMessagePromptTemplate.from_template("{prompt}")
-
-        chat_prompt = ChatPromptTemplate.from_messages([system_message, human_message])
+        messages, _, report = build_messages(document_text, prompt)
 
         # Generate the response using the chat model
-        response = llm(chat_prompt.format_prompt(document=document_text, prompt=prompt).to_messages())
-        return response.content
+        with tracing.stage("llm"):
+            response = llm(messages)
+        tracing.record_tokens(report["context_tokens"], count_tokens(response.content))
+        return response.content, report
     except Exception as e:
-        return f"Error: {e}"
+        tracing.record_error("chat_with_document", e)
+        return f"Error: {e}", None
 
 @app.post("/chat-with-document/")
 async def chat_with_document_endpoint(file: UploadFile = File(...), query: str = Form(...)):
     try:
         document_text = (await file.read()).decode('utf-8')
-        result = chat_with_document(document_text, query)
-        return JSONResponse(content={"response": result})
+        key = (hashlib.sha256(document_text.encode("utf-8")).hexdigest(), " ".join(query.lower().split()))
+        result, context = await llm_pool.run(key, chat_with_document, document_text, query)
+        return JSONResponse(content={"response": result, "context": context})
+    except QueueFull as e:
+        return JSONResponse(content={"error": str(e)}, status_code=429)
     except Exception as e:
+        tracing.record_error("chat_with_document", e)
         return JSONResponse(content={"error": str(e)}, status_code=500)
+
+# Stream the answer as server-sent events: a "references" event with the document
+# excerpts used, then "token" events, then "done" with the time to first token
+@app.post("/chat-with-document/stream/")
+async def chat_with_document_stream(file: UploadFile = File(...), query: str = Form(...)):
+    started = time.perf_counter()
+    try:
+        document_text = (await file.read()).decode('utf-8')
+        if llm_pool.full():
+            return JSONResponse(content={"error": "Too many requests in flight, try again shortly"}, status_code=429)
+        messages, context, report = await run_in_threadpool(build_messages, document_text, query)
+    except Exception as e:
+        tracing.record_error("chat_with_document", e)
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+    events = sse_answer(
+        streaming_llm, messages, llm_pool, time_to_first_token, started,
+        early_events=[("references", {"references": context, "context": report})],
+    )
+    return StreamingResponse(events, media_type="text/event-stream")
+
+tracing.collect("kyl_cache_requests_total", "Cache lookups by cache and result",
+                lambda: {("embeddings", "hit"): context_packer.embeddings.hits,
+                         ("embeddings", "miss"): context_packer.embeddings.misses},
+                ["cache", "result"], kind="counter")
+
+@app.get("/stream-stats/")
+async def stream_stats():
+    return {"time_to_first_token": time_to_first_token.summary(), "llm_pool": llm_pool.stats()}
@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import numpy as np
+
+from loadtest import latency_summary, run_load
+
+# Offline benchmark of ingest, retrieval and the apis. Embeddings come from the local
+# hashing embedder and answers from fake_llm.py, so runs need no network and are
+# repeatable; results are written as JSON to compare across commits.
+#   python benchmark.py --rows 10000 100000
+#   python benchmark.py --rows 1000000 --skip-load --output benchmarks/1m.json
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DATA_DIR = os.getenv("BENCHMARK_DATA_DIR", "./cache/benchmark")
+
+# Accounts are drawn from a Zipf-like distribution, so a few leaders tweet far more than the rest
+LEADERS = [
+    "RishiSunak", "Keir_Starmer", "EdwardJDavey", "Nigel_Farage", "theSNP", "CarlaDenyer", "HumzaYousaf",
+    "JoeBiden", "realDonaldTrump", "KamalaHarris", "RobertKennedyJr", "NikkiHaley", "RonDeSantis",
+    "CyrilRamaphosa", "Julius_S_Malema", "jsteenhuisen", "MYANC", "DA_News", "EFFSouthAfrica",
+    "JacobZuma", "NarendraModi", "RahulGandhi", "EmmanuelMacron", "OlafScholz", "GiorgiaMeloni",
+    "JustinTrudeau", "PierrePoilievre", "AlboMP", "PeterDutton_MP", "LulaOficial", "JMilei",
+    "AndrewHolnessJM", "WilliamsRuto", "RailaOdinga", "officialABAT", "PeterObi", "atiku",
+    "NAkufoAddo", "JDMahama", "HHichilema",
+]
+SOURCES = [
+    '<a href="http://twitter.com/download/iphone" rel="nofollow">Twitter for iPhone</a>',
+    '<a href="https://mobile.twitter.com" rel="nofollow">Twitter Web App</a>',
+    '<a href="https://about.twitter.com/products/tweetdeck" rel="nofollow">TweetDeck</a>',
+    '<a href="https://sproutsocial.com" rel="nofollow">Sprout Social</a>',
+    '<a href="http://twitter.com/download/android" rel="nofollow">Twitter for Android</a>',
+]
+SOURCE_WEIGHTS = [0.45, 0.25, 0.15, 0.1, 0.05]
+FILLER = (
+    "we will deliver for working families the country deserves better our plan is working today I met "
+    "with people across the nation to talk about the future change is coming together we can build a "
+    "stronger fairer economy that works for everyone thank you to everyone who joined us"
+).split()
+QUESTION_TEMPLATES = [
+    "What has {leader} said about {topic}?",
+    "How consistent has {leader} been on {topic}?",
+    "What is {leader}'s position on {topic} in {year}?",
+]
+# Tweets get denser towards polling day, spread over the five years before it
+ELECTION_DAY = datetime(2024, 7, 4, tzinfo=timezone.utc)
+HISTORY_DAYS = 5 * 365
+
+def leader_weights(count: int, exponent: float = 1.1) -> np.ndarray:
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+# Write a csv shaped like the scraped tweets: same columns, usernames sometimes given as
+# a stringified list, twitter-style dates and html anchors as sources
+def generate_csv(path: str, rows: int, seed: int = 0) -> None:
+    from scorecards import TOPICS
+
+    rng = np.random.default_rng(seed)
+    topics = list(TOPICS.values())
+    leaders = rng.choice(len(LEADERS), rows, p=leader_weights(len(LEADERS)))
+    co_authors = rng.choice(len(LEADERS), rows, p=leader_weights(len(LEADERS)))
+    shared = rng.random(rows) < 0.15
+    days = np.minimum(rng.exponential(HISTORY_DAYS / 4, rows), HISTORY_DAYS)
+    # Posting hours cluster around the working day
+    seconds = days * 86400 + np.mod(rng.normal(14, 4, rows), 24) * 3600
+    likes = rng.lognormal(6, 1.5, rows).astype(np.int64)
+    retweets = (likes * rng.uniform(0.05, 0.3, rows)).astype(np.int64)
+    views = (likes * rng.uniform(20, 80, rows)).astype(np.int64)
+    replies = (likes * rng.uniform(0.01, 0.1, rows)).astype(np.int64)
+    sources = rng.choice(len(SOURCES), rows, p=SOURCE_WEIGHTS)
+    retweeted = rng.random(rows) < 0.2
+    topic_counts = rng.choice([1, 1, 1, 2], rows)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["username", "source", "likes", "retweets", "views", "date_posted",
+                         "reply_count", "retweet_status", "full_text"])
+        for i in range(rows):
+            name = LEADERS[leaders[i]]
+            if shared[i] and co_authors[i] != leaders[i]:
+                username = str([name, LEADERS[co_authors[i]]])
+            else:
+                username = name
+            posted = ELECTION_DAY - timedelta(seconds=float(seconds[i]))
+            words = []
+            for topic in rng.choice(len(topics), topic_counts[i], replace=False):
+                words.extend(rng.choice(topics[topic], 2))
+            words.extend(rng.choice(FILLER, 12))
+            rng.shuffle(words)
+            if rng.random() < 0.3:
+                words.append(f"#{words[0]}")
+            writer.writerow([
+                username, SOURCES[sources[i]], likes[i], retweets[i], views[i],
+                posted.strftime("%a %b %d %H:%M:%S +0000 %Y"), replies[i], bool(retweeted[i]), " ".join(words),
+            ])
+
+def dataset_path(data_dir: str, rows: int, seed: int) -> str:
+    return os.path.join(data_dir, f"tweets-{rows}-seed{seed}.csv")
+
+def questions(count: int, seed: int = 1) -> list:
+    from scorecards import TOPICS
+
+    rng = np.random.default_rng(seed)
+    names = list(TOPICS)
+    return [
+        QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(
+            leader=LEADERS[rng.choice(len(LEADERS), p=leader_weights(len(LEADERS)))].replace("_", " "),
+            topic=names[rng.integers(len(names))].replace("_", " "),
+            year=2020 + i % 5,
+        )
+        for i in range(count)
+    ]
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _time_calls(fn, items) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies, {}, time.perf_counter() - started)
+
+# Runs in a fresh process per dataset so memory peaks are not shared between sizes. The
+# environment is set before any module that reads it at import time is loaded.
+def bench_dataset(csv_path: str, work_dir: str, query_count: int, k: int, embedding_size: int) -> dict:
+    os.environ.update({
+        "EMBEDDINGS_BACKEND": "local",
+        "LOCAL_EMBEDDING_SIZE": str(embedding_size),
+        "OPENAI_API_KEY": "fake",
+        "INDEX_DIR": os.path.join(work_dir, "indexes"),
+        "EMBEDDING_CACHE_PATH": os.path.join(work_dir, "embeddings.db"),
+    })
+    sys.path.insert(0, ROOT)
+    import index_store
+    import ingest
+    import tracing
+    from embedding_cache import get_embeddings
+
+    embeddings = get_embeddings()
+    baseline_rss = peak_rss_mb()
+    # run_ingest removes its input when done, so ingest a copy
+    upload = os.path.join(work_dir, "upload.csv")
+    shutil.copyfile(csv_path, upload)
+    key = file_sha256(upload)
+    job = ingest.create_job(key, upload)
+    started = time.perf_counter()
+    ingest.run_ingest(job, upload, embeddings)
+    elapsed = time.perf_counter() - started
+    if job["status"] != "done":
+        raise RuntimeError(f"Ingest failed: {job['error']}")
+
+    index_dir = index_store.index_path(key)
+    index_bytes = sum(entry.stat().st_size for entry in os.scandir(index_dir) if entry.is_file())
+    stages = {labels[0]: {"count": count, "seconds": total}
+              for labels, (count, total) in tracing.stage_seconds.snapshot().items()}
+    result = {
+        "ingest": {
+            "rows": job["rows_done"],
+            "seconds": elapsed,
+            "rows_per_second": job["rows_done"] / elapsed,
+            "mb_per_second": os.path.getsize(csv_path) / 1e6 / elapsed,
+            "stages": stages,
+            "index_build_seconds": stages.get("index_build", {}).get("seconds", 0.0),
+            "index_bytes": index_bytes,
+            "baseline_rss_mb": baseline_rss,
+            "peak_rss_mb": peak_rss_mb(),
+        },
+    }
+
+    import api
+
+    corpus = api.get_corpus()
+    asked = questions(query_count)
+    # Warm up the mapped index pages and the tokenizer before timing
+    for question in asked[:5]:
+        api.query_store(question, corpus, None, k, "hybrid")
+    result["query_store"] = {
+        mode: _time_calls(lambda question: api.query_store(question, corpus, None, k, mode), asked)
+        for mode in ("vector", "lexical", "hybrid")
+    }
+    result["query_store"]["hybrid_scoped"] = _time_calls(
+        lambda question: api.query_store(
+            question, corpus, api.candidate_ids(corpus, api.resolve_usernames(corpus, question)), k, "hybrid"
+        ),
+        asked,
+    )
+    result["query_store"]["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server for {url} did not start")
+
+_stage_line = re.compile(r'kyl_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)')
+
+# Mean time per stage from a /metrics scrape
+def stage_means(metrics: str) -> dict:
+    values = {}
+    for kind, name, value in _stage_line.findall(metrics):
+        values.setdefault(name, {})[kind] = float(value)
+    return {name: {"count": int(v.get("count", 0)), "mean_ms": v.get("sum", 0.0) / v["count"] * 1000}
+            for name, v in values.items() if v.get("count")}
+
+# Start fake_llm.py, api.py and api3.py against the index in work_dir and load them
+def bench_load(work_dir: str, args) -> dict:
+    fake_port, api_port, document_port = _free_port(), _free_port(), _free_port()
+    env = {
+        **os.environ,
+        "EMBEDDINGS_BACKEND": "local",
+        "LOCAL_EMBEDDING_SIZE": str(args.embedding_size),
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_API_BASE": f"http://127.0.0.1:{fake_port}/v1",
+        "INDEX_DIR": os.path.join(work_dir, "indexes"),
+        "EMBEDDING_CACHE_PATH": os.path.join(work_dir, "embeddings.db"),
+        # Every question is distinct; also keep the semantic tier from matching near-duplicates
+        "ANSWER_CACHE_THRESHOLD": "2",
+        "FAKE_LLM_PORT": str(fake_port),
+        "FAKE_LLM_LATENCY": str(args.llm_latency),
+        "FAKE_LLM_TOKENS": str(args.llm_tokens),
+        "FAKE_LLM_TOKEN_DELAY": str(args.llm_token_delay),
+    }
+    log = open(os.path.join(work_dir, "servers.log"), "w")
+    commands = [
+        ([sys.executable, "fake_llm.py"], f"http://127.0.0.1:{fake_port}/docs"),
+        ([sys.executable, "-m", "uvicorn", "api:app", "--port", str(api_port)], f"http://127.0.0.1:{api_port}/metrics"),
+        ([sys.executable, "-m", "uvicorn", "api3:app", "--port", str(document_port)],
+         f"http://127.0.0.1:{document_port}/metrics"),
+    ]
+    processes = []
+    try:
+        for command, ready_url in commands:
+            process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+            processes.append(process)
+            _wait_ready(ready_url, process)
+
+        document_path = os.path.join(ROOT, "text_clean.txt")
+        with open(document_path, encoding="utf-8") as f:
+            document = f.read()
+        asked = questions(args.requests, seed=2)
+        result = {
+            "query": asyncio.run(run_load(f"http://127.0.0.1:{api_port}/query/", asked,
+                                          args.concurrency, args.requests)),
+            "chat_with_document": asyncio.run(run_load(f"http://127.0.0.1:{document_port}/chat-with-document/",
+                                                       asked, args.concurrency, args.requests,
+                                                       form={"extracted_text": document})),
+        }
+        result["query"]["stages"] = stage_means(httpx.get(f"http://127.0.0.1:{api_port}/metrics").text)
+        result["chat_with_document"]["stages"] = stage_means(
+            httpx.get(f"http://127.0.0.1:{document_port}/metrics").text)
+        return result
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        log.close()
+
+def git_commit() -> dict:
+    def git(*command):
+        return subprocess.run(["git", *command], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of ingest, retrieval and the apis")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=BENCHMARK_DATA_DIR, help="where generated csvs are kept and reused")
+    parser.add_argument("--work-dir", default=None, help="indexes and caches for the run, a temp dir by default")
+    parser.add_argument("--output", default=None, help="result file, benchmarks/<commit>.json by default")
+    parser.add_argument("--embedding-size", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200, help="query_store calls per retrieval mode")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--skip-load", action="store_true", help="skip the end-to-end api load test")
+    parser.add_argument("--load-rows", type=int, default=None, help="dataset served during the load test, the smallest by default")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-tokens", type=int, default=100)
+    parser.add_argument("--llm-token-delay", type=float, default=0.002)
+    args = parser.parse_args()
+    if args.load_rows is not None and args.load_rows not in args.rows:
+        parser.error("--load-rows must be one of --rows")
+
+    work_root = args.work_dir or tempfile.mkdtemp(prefix="kyl-benchmark-")
+    report = {
+        **git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "work_dir", "data_dir")},
+        "datasets": {},
+    }
+    spawn = multiprocessing.get_context("spawn")
+    try:
+        for rows in sorted(args.rows):
+            csv_path = dataset_path(args.data_dir, rows, args.seed)
+            generated = 0.0
+            if not os.path.exists(csv_path):
+                started = time.perf_counter()
+                generate_csv(csv_path, rows, args.seed)
+                generated = time.perf_counter() - started
+            work_dir = os.path.join(work_root, str(rows))
+            os.makedirs(work_dir, exist_ok=True)
+            with spawn.Pool(1) as pool:
+                result = pool.apply(bench_dataset, (csv_path, work_dir, args.queries, args.k, args.embedding_size))
+            report["datasets"][str(rows)] = {
+                "csv_mb": os.path.getsize(csv_path) / 1e6,
+                "generate_seconds": generated,
+                **result,
+            }
+            print(f"{rows} rows: {result['ingest']['rows_per_second']:.0f} rows/s, "
+                  f"hybrid p50 {result['query_store']['hybrid']['p50_ms']:.2f} ms", file=sys.stderr)
+
+        if not args.skip_load:
+            load_rows = args.load_rows or min(args.rows)
+            report["load"] = {"rows": load_rows, **bench_load(os.path.join(work_root, str(load_rows)), args)}
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    output = args.output or os.path.join("benchmarks", f"{report['commit'][:12] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import tiktoken
+from langchain.embeddings.base import Embeddings
+
+import tracing
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "300"))
+CHUNK_CACHE_SIZE = int(os.getenv("CHUNK_CACHE_SIZE", "64"))
+
+_paragraphs = re.compile(r"\n\s*\n")
+_term = re.compile(r"\w+")
+
+@lru_cache(maxsize=None)
+def _encoder(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken downloads its tables on first use; without network fall back to
+        # the usual ~4 characters per token estimate
+        return None
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoder = _encoder(model)
+    if encoder is None:
+        return math.ceil(len(text) / 4)
+    return len(encoder.encode(text, disallowed_special=()))
+
+# Split text into chunks of at most chunk_tokens, breaking on paragraphs, then lines, then words
+def split_chunks(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
+    pieces = []
+    for paragraph in _paragraphs.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= chunk_tokens:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.splitlines():
+            if count_tokens(line) <= chunk_tokens:
+                pieces.append(line)
+                continue
+            words = line.split()
+            step = max(1, chunk_tokens * 3 // 4)
+            pieces.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+
+    chunks, current, current_tokens = [], [], 0
+    for piece in pieces:
+        tokens = count_tokens(piece)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+class ChunkedDocument:
+    def __init__(self, text: str, chunk_tokens: int):
+        self.chunks = split_chunks(text, chunk_tokens)
+        self.tokens = [count_tokens(chunk) for chunk in self.chunks]
+        self.total_tokens = count_tokens(text)
+        self.terms = [Counter(_term.findall(chunk.lower())) for chunk in self.chunks]
+        self.vectors = None
+        # Held while the chunk vectors are embedded so concurrent questions embed them once
+        self.lock = threading.Lock()
+
+# Builds prompt context for a question from only the most relevant chunks of a
+# document, staying within a token budget. Documents are chunked once and cached by
+# content hash; chunk embeddings are computed on first use when an embedder is given,
+# otherwise chunks are ranked by tf-idf overlap with the question.
+class ContextPacker:
+    def __init__(self, embeddings: Optional[Embeddings] = None, budget: int = CONTEXT_TOKEN_BUDGET,
+                 chunk_tokens: int = CHUNK_TOKENS, cache_size: int = CHUNK_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.budget = budget
+        self.chunk_tokens = chunk_tokens
+        self.cache_size = cache_size
+        self._documents = OrderedDict()
+        # Documents being chunked right now, so concurrent requests for the same new
+        # document wait for the first one instead of chunking it again
+        self._building: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def document(self, text: str) -> ChunkedDocument:
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._documents:
+                self._documents.move_to_end(key)
+                return self._documents[key]
+            building = self._building.get(key)
+            if building is None:
+                self._building[key] = future = Future()
+        if building is not None:
+            return building.result()
+
+        try:
+            document = ChunkedDocument(text, self.chunk_tokens)
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._documents[key] = document
+            while len(self._documents) > self.cache_size:
+                self._documents.popitem(last=False)
+            del self._building[key]
+        future.set_result(document)
+        return document
+
+    def _scores(self, question: str, document: ChunkedDocument) -> np.ndarray:
+        if self.embeddings is not None:
+            with tracing.stage("embedding"):
+                if document.vectors is None:
+                    with document.lock:
+                        if document.vectors is None:
+                            vectors = np.array(self.embeddings.embed_documents(document.chunks), dtype=np.float32)
+                            document.vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                query = np.array(self.embeddings.embed_query(question), dtype=np.float32)
+            return document.vectors @ (query / max(np.linalg.norm(query), 1e-12))
+
+        terms = set(_term.findall(question.lower()))
+        count = len(document.chunks)
+        scores = np.zeros(count, dtype=np.float32)
+        for term in terms:
+            frequencies = np.array([chunk_terms.get(term, 0) for chunk_terms in document.terms], dtype=np.float32)
+            matches = np.count_nonzero(frequencies)
+            if matches:
+                scores += np.log1p(frequencies) * math.log(1 + count / matches)
+        return scores
+
+    # Greedily take texts in the given order until the budget is spent
+    def fit(self, texts: List[str], budget: Optional[int] = None) -> Tuple[List[str], int]:
+        budget = self.budget if budget is None else budget
+        chosen, used = [], 0
+        for text in texts:
+            tokens = count_tokens(text)
+            if used + tokens > budget:
+                continue
+            chosen.append(text)
+            used += tokens
+        return chosen, used
+
+    # Pack the chunks of document_text most relevant to the question. Chosen chunks
+    # are returned in document order so the context reads naturally.
+    def pack(self, question: str, document_text: str, preamble: str = "",
+             baseline_tokens: Optional[int] = None) -> Tuple[str, dict]:
+        document = self.document(document_text)
+        preamble_tokens = count_tokens(preamble) if preamble else 0
+        budget = max(0, self.budget - preamble_tokens)
+        chosen, used = [], 0
+        if document.chunks:
+            for i in np.argsort(-self._scores(question, document), kind="stable"):
+                if used + document.tokens[i] <= budget:
+                    chosen.append(int(i))
+                    used += document.tokens[i]
+        context = "\n\n".join(document.chunks[i] for i in sorted(chosen))
+        if baseline_tokens is None:
+            baseline_tokens = count_tokens(preamble) + document.total_tokens
+        return context, self.report(baseline_tokens, preamble_tokens + used, len(chosen), len(document.chunks))
+
+    def report(self, baseline_tokens: int, context_tokens: int, chunks_used: int, chunks_total: int) -> dict:
+        return {
+            "budget": self.budget,
+            "context_tokens": context_tokens,
+            "baseline_tokens": baseline_tokens,
+            "tokens_saved": max(0, baseline_tokens - context_tokens),
+            "chunks_used": chunks_used,
+            "chunks_total": chunks_total,
+        }
@@ -0,0 +1,59 @@
+import hashlib
+import io
+import os
+import tempfile
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from metadata_index import parse_usernames
+
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "./cache/datasets")
+
+# Columns turned into categoricals when they repeat enough; other text columns are
+# converted too if fewer than half their values are distinct
+CATEGORICAL_COLUMNS = ("username", "source", "retweet_status")
+CATEGORICAL_RATIO = 0.5
+
+def dataset_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _with_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    for column in df.columns:
+        if df[column].dtype != object:
+            continue
+        if column in CATEGORICAL_COLUMNS or df[column].nunique(dropna=False) < CATEGORICAL_RATIO * len(df):
+            df[column] = df[column].astype("category")
+    return df
+
+# Parse an uploaded csv once and keep it as Parquet keyed by content hash. Later loads
+# memory map the Parquet file instead of parsing the csv again.
+def load_dataset(data: bytes) -> Tuple[str, pd.DataFrame]:
+    key = dataset_key(data)
+    path = os.path.join(DATASET_CACHE_DIR, f"{key}.parquet")
+    if os.path.exists(path):
+        table = pq.read_table(path, memory_map=True)
+        return key, table.to_pandas(split_blocks=True, self_destruct=True)
+
+    df = _with_categoricals(pd.read_csv(io.BytesIO(data)))
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=DATASET_CACHE_DIR, prefix=".tmp-", suffix=".parquet")
+    os.close(fd)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+    os.replace(tmp_path, path)
+    return key, df
+
+# Row positions for every leader named in the username column. Rows listing several
+# accounts belong to each of them.
+def leader_partitions(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    if "username" not in df.columns:
+        return {}
+    rows = {}
+    usernames = df["username"].astype(str)
+    for value, positions in usernames.groupby(usernames, observed=True).indices.items():
+        for name in parse_usernames(value):
+            rows.setdefault(name, []).append(positions)
+    return {name: np.sort(np.concatenate(parts)) for name, parts in rows.items()}
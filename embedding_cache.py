@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+# Embeddings are stored next to the pandasai cache
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./cache/embeddings.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+LOCAL_EMBEDDING_SIZE = int(os.getenv("LOCAL_EMBEDDING_SIZE", "256"))
+
+_whitespace = re.compile(r"\s+")
+_token = re.compile(r"\w+")
+
+# Normalize text so trivially different copies of a row share one cache entry
+def normalize_text(text: str) -> str:
+    return _whitespace.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+def cache_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+# Deterministic offline embedder using the hashing trick over word tokens.
+# Only meant for tests and benchmarks; it needs no network or API key.
+class HashEmbeddings(Embeddings):
+    def __init__(self, size: int = 256):
+        self.size = size
+        self.model = f"hash-{size}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in _token.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+# Wraps an embedder with a persistent sqlite cache of float32 vectors.
+# Only texts that are new (neither cached nor repeated earlier in the batch)
+# are sent to the underlying embedder. Least recently used rows are evicted
+# once the cache grows past max_entries.
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, model: str = None, path: str = EMBEDDING_CACHE_PATH,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.model = model or getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.embedded = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        if found:
+            now = time.time()
+            self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        return found
+
+    def _store(self, items: Dict[str, np.ndarray]) -> None:
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, vector.astype(np.float32).tobytes(), now) for key, vector in items.items()],
+        )
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(text, self.model) for text in texts]
+        with self._lock:
+            found = self._lookup(list(set(keys)))
+            self._db.commit()
+
+        # Deduplicate within the batch so each new text is embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            vectors = self.embeddings.embed_documents([text for _, text in batch])
+            new = {key: np.asarray(vector, dtype=np.float32) for (key, _), vector in zip(batch, vectors)}
+            self.embedded += len(new)
+            found.update(new)
+            with self._lock:
+                self._store(new)
+                self._db.commit()
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "embedded": self.embedded,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+# Build the embedder used by the apis. EMBEDDINGS_BACKEND=local swaps in the
+# deterministic hashing embedder so ingest can run without OpenAI.
+def get_embeddings() -> CachedEmbeddings:
+    if os.getenv("EMBEDDINGS_BACKEND", "openai") == "local":
+        return CachedEmbeddings(HashEmbeddings(LOCAL_EMBEDDING_SIZE))
+    from langchain.embeddings.openai import OpenAIEmbeddings
+    embeddings = OpenAIEmbeddings()
+    return CachedEmbeddings(embeddings, model=embeddings.model)
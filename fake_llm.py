@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from embedding_cache import HashEmbeddings
+
+# Stand-in for the OpenAI API so latency can be measured offline. Point the apis at it with
+#   OPENAI_API_BASE=http://localhost:9000/v1 OPENAI_API_KEY=fake uvicorn api:app
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+FAKE_LLM_TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "200"))
+FAKE_LLM_TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.005"))
+
+app = FastAPI()
+embedder = HashEmbeddings(size=int(os.getenv("FAKE_EMBEDDING_SIZE", "1536")))
+
+def _completion_words(messages):
+    seed = " ".join(str(m.get("content", "")) for m in messages).split()[-20:] or ["ok"]
+    return [seed[i % len(seed)] for i in range(FAKE_LLM_TOKENS)]
+
+def _prompt_tokens(messages):
+    return sum(len(str(m.get("content", "")).split()) for m in messages)
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    words = _completion_words(messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "fake")
+    await asyncio.sleep(FAKE_LLM_LATENCY)
+
+    if body.get("stream"):
+        async def events():
+            for word in words:
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(FAKE_LLM_TOKEN_DELAY)
+            done = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await asyncio.sleep(FAKE_LLM_TOKEN_DELAY * len(words))
+    prompt_tokens = _prompt_tokens(messages)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)},
+    }
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    # langchain may send pre-tokenized input as lists of token ids
+    texts = [" ".join(map(str, text)) if isinstance(text, list) else text for text in inputs]
+    vectors = embedder.embed_documents(texts)
+    tokens = sum(len(text.split()) for text in texts)
+    return {
+        "object": "list",
+        "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+        "model": body.get("model", "fake"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("FAKE_LLM_PORT", "9000")))
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from langchain.docstore.document import Document
+from langchain.embeddings.base import Embeddings
+
+import tracing
+from lexical_index import LexicalIndex
+from metadata_index import MetadataIndex
+from scorecards import Scorecards
+
+# Directory that holds one sub-directory per indexed corpus, shared by every worker
+INDEX_DIR = os.getenv("INDEX_DIR", "./indexes")
+
+# Name of the pointer file holding the key of the most recently uploaded corpus
+CURRENT_FILE = "CURRENT"
+
+# Build a content-addressed key from the raw csv bytes
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def index_path(key: str) -> str:
+    return os.path.join(INDEX_DIR, key)
+
+# Files making up a stored corpus: raw float32 vectors and their squared norms, the
+# documents as JSON lines, and the byte offset of every line
+INDEX_META_FILE = "index.json"
+VECTORS_FILE = "vectors.f32"
+NORMS_FILE = "norms.f32"
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "documents.offsets"
+
+# Rows scored per step of a brute-force search, bounding the scratch memory it needs
+SEARCH_BLOCK_ROWS = 65536
+
+def has_index(key: str) -> bool:
+    return os.path.exists(os.path.join(index_path(key), INDEX_META_FILE))
+
+# Streams vectors and documents straight to files in a temporary directory as they are
+# embedded, so building an index keeps nothing per row in memory
+class IndexWriter:
+    def __init__(self):
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        self.path = tempfile.mkdtemp(dir=INDEX_DIR, prefix=".tmp-")
+        self.count = 0
+        self.dimension = None
+        self._offset = 0
+        self._vectors = open(os.path.join(self.path, VECTORS_FILE), "wb")
+        self._norms = open(os.path.join(self.path, NORMS_FILE), "wb")
+        self._documents = open(os.path.join(self.path, DOCUMENTS_FILE), "wb")
+        self._offsets = open(os.path.join(self.path, OFFSETS_FILE), "wb")
+        self._offsets.write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def add(self, vectors: np.ndarray, documents: List[Document]) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        self._vectors.write(vectors.tobytes())
+        self._norms.write(np.einsum("ij,ij->i", vectors, vectors).astype(np.float32).tobytes())
+        offsets = np.empty(len(documents), dtype=np.int64)
+        for i, doc in enumerate(documents):
+            line = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}).encode("utf-8") + b"\n"
+            self._documents.write(line)
+            self._offset += len(line)
+            offsets[i] = self._offset
+        self._offsets.write(offsets.tobytes())
+        self.count += len(documents)
+
+    def close(self) -> None:
+        for f in (self._vectors, self._norms, self._documents, self._offsets):
+            f.close()
+        with open(os.path.join(self.path, INDEX_META_FILE), "w") as f:
+            json.dump({"count": self.count, "dimension": self.dimension}, f)
+
+    def abort(self) -> None:
+        for f in (self._vectors, self._norms, self._documents, self._offsets):
+            f.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+# Read-only view of a stored corpus. Vectors, norms and offsets are np.memmap views and
+# documents are read on demand with pread, so loading only opens files: every worker
+# shares the same pages through the OS page cache and nothing is unpickled.
+class VectorIndex:
+    def __init__(self, path: str, embedding_function):
+        with open(os.path.join(path, INDEX_META_FILE)) as f:
+            meta = json.load(f)
+        self.path = path
+        self.embedding_function = embedding_function
+        self.count = meta["count"]
+        self.dimension = meta["dimension"]
+        self.vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode="r",
+                                 shape=(self.count, self.dimension))
+        self.norms = np.memmap(os.path.join(path, NORMS_FILE), dtype=np.float32, mode="r", shape=(self.count,))
+        self.offsets = np.memmap(os.path.join(path, OFFSETS_FILE), dtype=np.int64, mode="r", shape=(self.count + 1,))
+        self._fd = os.open(os.path.join(path, DOCUMENTS_FILE), os.O_RDONLY)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __del__(self):
+        fd = getattr(self, "_fd", None)
+        if fd is not None:
+            os.close(fd)
+
+    def document(self, position: int) -> Document:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        data = json.loads(os.pread(self._fd, end - start, start))
+        return Document(page_content=data["page_content"], metadata=data["metadata"])
+
+    # Exact L2 nearest neighbours, scored block by block straight from the mapped
+    # vectors. When positions is given only those rows are read and scored.
+    def search(self, vector: np.ndarray, k: int, positions: Optional[np.ndarray] = None) -> List[int]:
+        if k <= 0:
+            return []
+        vector = np.asarray(vector, dtype=np.float32)
+        rows = self.count if positions is None else len(positions)
+        best_distances = np.empty(0, dtype=np.float32)
+        best_positions = np.empty(0, dtype=np.int64)
+        for start in range(0, rows, SEARCH_BLOCK_ROWS):
+            if positions is None:
+                block = np.arange(start, min(start + SEARCH_BLOCK_ROWS, rows))
+                vectors, norms = self.vectors[start:start + SEARCH_BLOCK_ROWS], self.norms[start:start + SEARCH_BLOCK_ROWS]
+            else:
+                block = positions[start:start + SEARCH_BLOCK_ROWS]
+                vectors, norms = self.vectors[block], self.norms[block]
+            # |x - q|^2 without the constant |q|^2 term
+            distances = np.concatenate([best_distances, norms - 2 * (vectors @ vector)])
+            candidates = np.concatenate([best_positions, block])
+            if len(distances) > k:
+                keep = np.argpartition(distances, k)[:k]
+                distances, candidates = distances[keep], candidates[keep]
+            best_distances, best_positions = distances, candidates
+        order = np.argsort(best_distances, kind="stable")
+        return [int(i) for i in best_positions[order]]
+
+# Publish an index written by an IndexWriter, and any side indexes built with it, under
+# its key. The writer's temporary directory is completed and then renamed, so other
+# workers never see a half-written index.
+def save_index(key: str, writer: IndexWriter, extras: Iterable = ()) -> str:
+    target = index_path(key)
+    if has_index(key):
+        writer.abort()
+        return target
+
+    try:
+        writer.close()
+        for extra in extras:
+            extra.save(writer.path)
+        os.rename(writer.path, target)
+    except OSError:
+        # Another worker finished the same corpus first
+        shutil.rmtree(writer.path, ignore_errors=True)
+        if not has_index(key):
+            raise
+    return target
+
+def load_index(key: str, embeddings: Embeddings) -> VectorIndex:
+    return VectorIndex(index_path(key), embeddings.embed_query)
+
+def load_metadata(key: str) -> MetadataIndex:
+    return MetadataIndex.load(index_path(key))
+
+def load_lexical(key: str) -> Optional[LexicalIndex]:
+    return LexicalIndex.load(index_path(key))
+
+def load_scorecards(key: str) -> Optional[Scorecards]:
+    return Scorecards.load(index_path(key))
+
+# Write scorecards for an index stored before they were built alongside it
+def save_scorecards(key: str, scorecards: Scorecards) -> None:
+    scorecards.save(index_path(key))
+
+# Mark a stored index as the active corpus for all workers
+def set_current(key: str) -> None:
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=INDEX_DIR, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(key)
+    os.replace(tmp_path, os.path.join(INDEX_DIR, CURRENT_FILE))
+
+def get_current() -> Optional[str]:
+    try:
+        with open(os.path.join(INDEX_DIR, CURRENT_FILE)) as f:
+            key = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return key if key and has_index(key) else None
+
+# Everything stored for one corpus, loaded together and never modified, so a request
+# holding it keeps reading one corpus even if the current one is switched meanwhile
+class Corpus(NamedTuple):
+    key: str
+    vectors: VectorIndex
+    metadata: MetadataIndex
+    lexical: Optional[LexicalIndex]
+    scorecards: Optional[Scorecards]
+
+def load_corpus(key: str, embeddings: Embeddings) -> Corpus:
+    return Corpus(key, load_index(key, embeddings), load_metadata(key), load_lexical(key), load_scorecards(key))
+
+# Row positions of the k nearest vectors to the query. When ids is given only those
+# positions are considered; vectors outside the selection are skipped, not scored.
+def vector_search(store: VectorIndex, query: str, k: int = 4, ids: Optional[np.ndarray] = None) -> List[int]:
+    if ids is not None:
+        ids = np.sort(ids[ids < len(store)])
+        if len(ids) == 0:
+            return []
+    with tracing.stage("embedding"):
+        vector = store.embedding_function(query)
+    with tracing.stage("vector_search"):
+        return store.search(vector, k, ids)
+
+def documents(store: VectorIndex, positions: Iterable[int]) -> List[Document]:
+    return [store.document(i) for i in positions]
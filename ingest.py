@@ -0,0 +1,165 @@
+import csv
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from fastapi import UploadFile
+from langchain.docstore.document import Document
+from langchain.embeddings.base import Embeddings
+
+import index_store
+import tracing
+from lexical_index import LexicalIndex
+from metadata_index import MetadataIndex, row_metadata
+from scorecards import Scorecards
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+
+# Job status files live next to the indexes so every worker can answer status requests
+JOBS_DIR = os.path.join(index_store.INDEX_DIR, "jobs")
+
+# Stream an upload to a temporary file chunk by chunk, hashing it on the way
+async def save_upload(file: UploadFile) -> Tuple[str, str]:
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp_file:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            tmp_file.write(chunk)
+    return tmp_file.name, digest.hexdigest()
+
+# Parse csv rows lazily into documents laid out the same way as CSVLoader.
+# When a progress dict is given, its "bytes_read" entry tracks how far into the file we are.
+def iter_csv_documents(file_path: str, progress: Optional[dict] = None) -> Iterator[Document]:
+    progress = progress if progress is not None else {}
+    progress["bytes_read"] = 0
+
+    def lines(f):
+        for line in f:
+            progress["bytes_read"] += len(line)
+            yield line.decode("utf-8", errors="replace")
+
+    with open(file_path, "rb") as f:
+        for i, row in enumerate(csv.DictReader(lines(f), delimiter=",")):
+            content = "\n".join(f"{k.strip()}: {(v or '').strip()}" for k, v in row.items() if k is not None)
+            metadata = {"source": file_path, "row": i, **row_metadata(row)}
+            yield Document(page_content=content, metadata=metadata)
+
+def iter_batches(documents: Iterator[Document], size: int) -> Iterator[List[Document]]:
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+def write_job(job: dict) -> None:
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=JOBS_DIR, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, _job_path(job["job_id"]))
+
+def read_job(job_id: str) -> Optional[dict]:
+    try:
+        with open(_job_path(job_id)) as f:
+            job = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    elapsed = (job.get("finished_at") or time.time()) - job["started_at"]
+    job["elapsed_seconds"] = elapsed
+    job["rows_per_second"] = job["rows_done"] / elapsed if elapsed > 0 else 0.0
+    job["eta_seconds"] = None
+    if job["status"] == "running" and job["bytes_done"] > 0:
+        rate = job["bytes_done"] / elapsed
+        job["eta_seconds"] = (job["bytes_total"] - job["bytes_done"]) / rate
+    elif job["status"] == "done":
+        job["eta_seconds"] = 0.0
+    return job
+
+def create_job(key: str, file_path: str) -> dict:
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "index": key,
+        "status": "queued",
+        "rows_done": 0,
+        "bytes_done": 0,
+        "bytes_total": os.path.getsize(file_path),
+        "started_at": time.time(),
+        "finished_at": None,
+        "error": None,
+    }
+    write_job(job)
+    return job
+
+# Scorecards carry over between uploads: a new scrape starts from the current corpus's
+# sums and only folds in rows that corpus has not seen. Rows dropped from the new scrape
+# stay counted, as the scorecards track everything a leader has said.
+def previous_scorecards(dimension: int) -> Scorecards:
+    key = index_store.get_current()
+    scorecards = index_store.load_scorecards(key) if key is not None else None
+    if scorecards is None or scorecards.dimension != dimension:
+        return Scorecards()
+    return scorecards
+
+# Embed the csv in bounded batches, growing the index and the leader scorecards one
+# batch at a time, then publish it as the current corpus. Runs in a background thread.
+def run_ingest(job: dict, file_path: str, embeddings: Embeddings, batch_size: int = INGEST_BATCH_SIZE) -> None:
+    job["status"] = "running"
+    write_job(job)
+    writer = None
+    try:
+        writer = index_store.IndexWriter()
+        metadata_index = MetadataIndex()
+        lexical_index = LexicalIndex()
+        scorecards = None
+        progress = {}
+        batches = iter_batches(iter_csv_documents(file_path, progress), batch_size)
+        for batch in tracing.timed_iter(batches, "csv_parse"):
+            texts = [doc.page_content for doc in batch]
+            metadatas = [doc.metadata for doc in batch]
+            with tracing.stage("embedding"):
+                vectors = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+            with tracing.stage("index_build"):
+                start = writer.count
+                metadata_index.add_batch(start, metadatas)
+                lexical_index.add_batch(start, texts)
+                if scorecards is None:
+                    scorecards = previous_scorecards(vectors.shape[1])
+                scorecards.update(vectors, texts, metadatas)
+                writer.add(vectors, batch)
+            job["rows_done"] += len(batch)
+            job["bytes_done"] = progress["bytes_read"]
+            write_job(job)
+
+        if writer.count == 0:
+            raise ValueError("CSV file contains no rows")
+        with tracing.stage("index_save"):
+            index_store.save_index(job["index"], writer, [metadata_index, lexical_index, scorecards])
+        writer = None
+        index_store.set_current(job["index"])
+        job["status"] = "done"
+    except Exception as e:
+        tracing.record_error("ingest", e)
+        if writer is not None:
+            writer.abort()
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        job["finished_at"] = time.time()
+        write_job(job)
+        os.remove(file_path)
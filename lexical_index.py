@@ -0,0 +1,146 @@
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+LEXICAL_TERMS_FILE = "lexical_terms.json"
+LEXICAL_ARRAYS = ("offsets", "docs", "tfs", "lengths")
+
+# Words plus hashtags and @mentions
+_token = re.compile(r"[#@]?\w+")
+
+# Hashtags and mentions are emitted whole and bare, "#NHS" -> "#nhs", "nhs", so a
+# question about the NHS finds #NHS tweets and "#nhs" still ranks tagged tweets first
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _token.findall(text.lower()):
+        tokens.append(token)
+        if token[0] in "#@":
+            tokens.append(token[1:])
+    return tokens
+
+# Merge several rankings (best first) with reciprocal-rank fusion
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[int]:
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            scores[position] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda position: -scores[position])
+
+# BM25 inverted index over the same row positions as the vector index. Postings are
+# stored on disk in CSR form (offsets / doc positions / term frequencies) as .npy
+# files that are memory mapped on load.
+class LexicalIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.terms: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.docs = np.empty(0, dtype=np.int32)
+        self.tfs = np.empty(0, dtype=np.uint16)
+        self.lengths = np.empty(0, dtype=np.int32)
+        # Postings added since the last flush, one numpy chunk per batch, with term ids
+        # numbered in order of first appearance in _pending_terms
+        self._pending_terms: Dict[str, int] = {}
+        self._pending: List[tuple] = []
+        self._pending_lengths: List[tuple] = []
+
+    def add(self, position: int, text: str) -> None:
+        self.add_batch(position, [text])
+
+    # Index texts at consecutive positions starting at start
+    def add_batch(self, start: int, texts: Sequence[str]) -> None:
+        term_ids, docs, tfs = [], [], []
+        lengths = np.empty(len(texts), dtype=np.int32)
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[i] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(self._pending_terms.setdefault(term, len(self._pending_terms)))
+                docs.append(start + i)
+                tfs.append(min(tf, 65535))
+        self._pending.append((np.array(term_ids, dtype=np.int32), np.array(docs, dtype=np.int32),
+                              np.array(tfs, dtype=np.uint16)))
+        self._pending_lengths.append((start, lengths))
+
+    # Fold pending postings into the CSR arrays with one sort over (term, position)
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        size = max(len(self.lengths), max(start + len(chunk) for start, chunk in self._pending_lengths))
+        lengths = np.zeros(size, dtype=np.int32)
+        lengths[:len(self.lengths)] = self.lengths
+        for start, chunk in self._pending_lengths:
+            lengths[start:start + len(chunk)] = chunk
+
+        terms = sorted(set(self.terms) | set(self._pending_terms))
+        ids = {term: i for i, term in enumerate(terms)}
+        old_ids = np.array([ids[term] for term in sorted(self.terms, key=self.terms.get)], dtype=np.int32)
+        new_ids = np.array([ids[term] for term in self._pending_terms], dtype=np.int32)
+        term_ids = np.concatenate([np.repeat(old_ids, np.diff(self.offsets))] + [new_ids[chunk] for chunk, _, _ in self._pending])
+        docs = np.concatenate([self.docs] + [chunk for _, chunk, _ in self._pending])
+        tfs = np.concatenate([self.tfs] + [chunk for _, _, chunk in self._pending])
+        self._pending.clear()
+        order = np.lexsort((docs, term_ids))
+
+        self.terms = ids
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(terms)))]).astype(np.int64)
+        self.docs = docs[order]
+        self.tfs = tfs[order]
+        self.lengths = lengths
+        self._pending_terms.clear()
+        self._pending_lengths.clear()
+
+    def __len__(self) -> int:
+        self._flush()
+        return len(self.lengths)
+
+    # Return up to k row positions ranked by BM25, optionally limited to the given positions
+    def search(self, query: str, k: int = 4, ids: Optional[np.ndarray] = None) -> List[int]:
+        self._flush()
+        count = len(self.lengths)
+        if count == 0 or k <= 0:
+            return []
+        average_length = max(float(self.lengths.mean()), 1.0)
+        scores = np.zeros(count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            i = self.terms.get(term)
+            if i is None:
+                continue
+            docs = self.docs[self.offsets[i]:self.offsets[i + 1]]
+            tfs = self.tfs[self.offsets[i]:self.offsets[i + 1]].astype(np.float32)
+            idf = np.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[docs] / average_length)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        if ids is not None:
+            mask = np.zeros(count, dtype=bool)
+            mask[ids[ids < count]] = True
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k)[:k]]
+        return [int(i) for i in matched[np.argsort(-scores[matched], kind="stable")]]
+
+    def save(self, folder_path: str) -> None:
+        self._flush()
+        with open(os.path.join(folder_path, LEXICAL_TERMS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": sorted(self.terms, key=self.terms.get)}, f)
+        for name in LEXICAL_ARRAYS:
+            np.save(os.path.join(folder_path, f"lexical_{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, folder_path: str) -> Optional["LexicalIndex"]:
+        path = os.path.join(folder_path, LEXICAL_TERMS_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(meta["k1"], meta["b"])
+        index.terms = {term: i for i, term in enumerate(meta["terms"])}
+        for name in LEXICAL_ARRAYS:
+            setattr(index, name, np.load(os.path.join(folder_path, f"lexical_{name}.npy"), mmap_mode="r"))
+        return index
@@ -0,0 +1,83 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+
+class QueueFull(Exception):
+    pass
+
+# Runs blocking LLM calls on a bounded thread pool so they never stall the event loop.
+# At most max_concurrency calls, pooled and streaming together, run at once and
+# max_queue more may wait; anything beyond that is rejected straight away with QueueFull. Calls sharing a key while one
+# is in flight wait on that call instead of making their own upstream request.
+class LLMPool:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # One limiter shared by pooled and streaming calls, so the two kinds together never
+        # exceed max_concurrency upstream requests
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.pending = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    async def run(self, key: Optional[Hashable], fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        if key is not None and key in self._inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight[key])
+
+        if self.full():
+            self.rejected += 1
+            raise QueueFull("Too many requests in flight, try again shortly")
+
+        self.pending += 1
+        # Run in a copy of the caller's context so request tracing follows the call into the pool
+        context = contextvars.copy_context()
+        future = asyncio.ensure_future(self._call(functools.partial(context.run, fn, *args, **kwargs)))
+        future.add_done_callback(lambda _: self._release(key, future))
+        if key is not None:
+            self._inflight[key] = future
+        # Shield the shared call so one client disconnecting does not cancel it for the others
+        return await asyncio.shield(future)
+
+    async def _call(self, call: Callable) -> Any:
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    def full(self) -> bool:
+        return self.pending >= self.max_concurrency + self.max_queue
+
+    # Hold a concurrency slot for an async (streaming) call for the duration of the block
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self.full():
+            self.rejected += 1
+            raise QueueFull("Too many requests in flight, try again shortly")
+        self.pending += 1
+        try:
+            async with self._slots:
+                yield
+        finally:
+            self.pending -= 1
+
+    def _release(self, key: Optional[Hashable], future: asyncio.Future) -> None:
+        self.pending -= 1
+        if key is not None and self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+
+# Fire concurrent requests at one of the apis and report latency percentiles.
+#   python loadtest.py --url http://localhost:8000/query/ --concurrency 32 --requests 500
+#   python loadtest.py --url http://localhost:8001/chat-with-document/ --form extracted_text=@text_clean.txt
+
+def latency_summary(latencies, errors, wall_time):
+    values = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies) + sum(errors.values()),
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_seconds": wall_time,
+        "throughput_rps": len(latencies) / wall_time if wall_time > 0 else 0.0,
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+async def run_load(url, questions, concurrency, total, form=None, timeout=120.0):
+    latencies = []
+    errors = {}
+    counter = iter(range(total))
+
+    async def worker(client):
+        for i in counter:
+            question = questions[i % len(questions)]
+            start = time.perf_counter()
+            try:
+                if form is not None:
+                    response = await client.post(url, data={**form, "query": question})
+                else:
+                    response = await client.post(url, json={"question": question})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return latency_summary(latencies, errors, time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent latency test for the query apis")
+    parser.add_argument("--url", default="http://localhost:8000/query/")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--question", action="append", help="question to send, may be repeated")
+    parser.add_argument("--form", action="append", default=[],
+                        help="send a form post with this field, name=value or name=@file")
+    args = parser.parse_args()
+
+    form = None
+    if args.form:
+        form = {}
+        for field in args.form:
+            name, value = field.split("=", 1)
+            if value.startswith("@"):
+                with open(value[1:], encoding="utf-8") as f:
+                    value = f.read()
+            form[name] = value
+
+    questions = args.question or [
+        "What is Starmer's position on immigration?",
+        "What has Sunak said about the economy?",
+        "How consistent has Starmer been on the NHS?",
+    ]
+    result = asyncio.run(run_load(args.url, questions, args.concurrency, args.requests, form))
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+METADATA_FILE = "metadata.npz"
+
+_handle = re.compile(r"[A-Za-z0-9_]{2,}")
+_anchor_text = re.compile(r">([^<]+)<")
+_twitter_date = re.compile(r"[A-Z][a-z]{2} [A-Z][a-z]{2} \d{2} \d{2}:\d{2}:\d{2} [+-]\d{4} \d{4}")
+_iso_date = re.compile(r"\d{4}-\d{2}(?:-\d{2})?")
+_word = re.compile(r"[a-z0-9_]+")
+# Capitalised or lower-case runs and digit runs inside a handle, e.g. "theSNP" -> the, SNP
+_name_part = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+# Words that show up inside many account names or in most questions. They never pick
+# out a leader on their own, e.g. "news" in skynewsbreak or "party" in reformparty_uk.
+GENERIC_WORDS = {
+    "the", "and", "for", "our", "you", "real", "official", "team", "news", "breaking", "break", "latest",
+    "live", "daily", "today", "now", "update", "updates", "party", "media", "online", "world", "politics",
+    "gov", "govt", "government", "info", "press", "office", "hq", "tv", "mp", "oficial", "my",
+}
+
+# Places and common nouns that appear inside handles (EFFSouthAfrica, UKLabour) and in
+# many questions about them. They only count as part of a full name, never alone.
+NON_NAME_WORDS = {
+    "south", "north", "east", "west", "africa", "african", "america", "american", "usa", "britain", "british",
+    "england", "english", "scotland", "scottish", "wales", "welsh", "ireland", "irish", "europe", "european",
+    "india", "indian", "kenya", "nigeria", "ghana", "zambia", "jamaica", "canada", "australia", "france",
+    "germany", "italy", "brazil", "argentina", "china", "russia", "ukraine", "israel", "gaza", "national",
+    "labour", "conservative", "conservatives", "tory", "tories", "democrat", "democrats", "republican",
+    "republicans", "liberal", "liberals", "green", "greens", "reform", "congress", "people", "peoples",
+    "president", "minister", "economy", "tax", "health", "vote", "election", "elections",
+}
+
+# The scraped csv stores usernames, sources and dates either as plain values or as
+# stringified python lists, so pull the individual values out with regexes.
+def parse_handles(value: str) -> List[str]:
+    return sorted(set(_handle.findall(value or "")))
+
+def parse_usernames(value: str) -> List[str]:
+    return sorted({name.lower() for name in _handle.findall(value or "")})
+
+def parse_sources(value: str) -> List[str]:
+    sources = _anchor_text.findall(value or "")
+    if not sources and value:
+        sources = [value]
+    return sorted({source.strip().lower() for source in sources if source.strip()})
+
+# Bucket dates by month, e.g. "2023-12"
+def parse_months(value: str) -> List[str]:
+    months = set()
+    for match in _twitter_date.findall(value or ""):
+        months.add(datetime.strptime(match, "%a %b %d %H:%M:%S %z %Y").strftime("%Y-%m"))
+    for match in _iso_date.findall(value or ""):
+        months.add(match[:7])
+    return sorted(months)
+
+# Words a handle is made of, e.g. "RishiSunak" -> Rishi, Sunak; "theSNP" -> the, SNP.
+# Lower-cased handles only split on underscores and digits.
+def _split_handle(handle: str) -> List[str]:
+    return [part.lower() for part in _name_part.findall(handle)]
+
+# Single words that may name a handle on their own: its name parts of 3+ letters that
+# are not generic, places or common nouns, plus the handle itself, e.g. "RishiSunak" ->
+# rishi, sunak, rishisunak; "EFFSouthAfrica" -> eff, effsouthafrica
+def name_parts(handle: str) -> Set[str]:
+    parts = {part for part in _split_handle(handle) if len(part) >= 3} - GENERIC_WORDS - NON_NAME_WORDS
+    parts.add(handle.lower())
+    return parts
+
+# The handle's name written as adjacent words, joined: "PeterDutton_MP" -> peterdutton,
+# "Julius_S_Malema" -> juliusmalema. None when the handle is a single word.
+def name_phrase(handle: str) -> Optional[str]:
+    words = [part for part in _split_handle(handle) if len(part) >= 2 and part not in GENERIC_WORDS]
+    return "".join(words) if len(words) >= 2 else None
+
+# Map every single-word alias and joined full name to the usernames it may refer to
+def name_aliases(handles: Iterable[str]) -> Dict[str, List[str]]:
+    aliases = defaultdict(set)
+    for handle in handles:
+        keys = name_parts(handle) | {handle.lower().replace("_", ""), name_phrase(handle)}
+        for key in keys - {None}:
+            aliases[key].add(handle.lower())
+    return {key: sorted(names) for key, names in aliases.items()}
+
+# Usernames named in a free-text question, e.g. "What did Sunak say?" -> ["rishisunak"].
+# Runs of adjacent words that spell a full name ("Peter Obi") are matched first and win
+# over their single words; a single word shared by several accounts is skipped.
+def match_names(question: str, aliases: Dict[str, List[str]], max_phrase: int = 4) -> List[str]:
+    words = _word.findall(question.lower())
+    matched, used = set(), set()
+    for size in range(max_phrase, 1, -1):
+        for start in range(len(words) - size + 1):
+            span = range(start, start + size)
+            names = aliases.get("".join(words[start:start + size]), ())
+            if len(names) == 1 and not used.intersection(span):
+                matched.update(names)
+                used.update(span)
+    for i, word in enumerate(words):
+        names = aliases.get(word, ())
+        if i not in used and len(names) == 1:
+            matched.update(names)
+    return sorted(matched)
+
+def row_metadata(row: Dict[str, str]) -> dict:
+    return {
+        "usernames": parse_usernames(row.get("username", "")),
+        "handles": parse_handles(row.get("username", "")),
+        "months": parse_months(row.get("date_posted", "") or row.get("date", "")),
+        "tweet_sources": parse_sources(row.get("source", "")),
+    }
+
+# Posting lists from metadata values to vector index row positions, used to narrow the
+# candidate set before any vector is scored
+class MetadataIndex:
+    def __init__(self, postings: Optional[Dict[str, np.ndarray]] = None, handles: Iterable[str] = ()):
+        # (key id, position) pairs added since the last flush, one numpy chunk per batch
+        self._pending_keys: Dict[str, int] = {}
+        self._pending: List[tuple] = []
+        self.postings = postings or {}
+        # Usernames as written in the csv, kept for their camelCase name parts
+        self.handles: Set[str] = set(handles)
+        self._aliases = None
+
+    def add(self, position: int, metadata: dict) -> None:
+        self.add_batch(position, [metadata])
+
+    # Index metadatas at consecutive positions starting at start
+    def add_batch(self, start: int, metadatas: Sequence[dict]) -> None:
+        key_ids, positions = [], []
+        for position, metadata in enumerate(metadatas, start):
+            self.handles.update(metadata.get("handles", []))
+            keys = ([f"user:{name}" for name in metadata.get("usernames", [])]
+                    + [f"month:{month}" for month in metadata.get("months", [])]
+                    + [f"source:{source}" for source in metadata.get("tweet_sources", [])])
+            for key in keys:
+                key_ids.append(self._pending_keys.setdefault(key, len(self._pending_keys)))
+                positions.append(position)
+        self._pending.append((np.array(key_ids, dtype=np.int32), np.array(positions, dtype=np.int32)))
+        self._aliases = None
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        key_ids = np.concatenate([chunk for chunk, _ in self._pending])
+        positions = np.concatenate([chunk for _, chunk in self._pending])
+        self._pending.clear()
+        order = np.lexsort((positions, key_ids))
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(key_ids, minlength=len(self._pending_keys)))])
+        positions = positions[order].astype(np.int64)
+        for key, i in self._pending_keys.items():
+            new = positions[bounds[i]:bounds[i + 1]]
+            if key in self.postings:
+                new = np.union1d(self.postings[key], new)
+            self.postings[key] = new
+        self._pending_keys.clear()
+
+    def values(self, kind: str) -> List[str]:
+        self._flush()
+        prefix = f"{kind}:"
+        return [key[len(prefix):] for key in self.postings if key.startswith(prefix)]
+
+    def _union(self, keys: Iterable[str]) -> np.ndarray:
+        arrays = [self.postings[key] for key in keys if key in self.postings]
+        if not arrays:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(arrays))
+
+    # Return the positions matching every given filter, or None when no filter applies
+    def select(self, usernames: Optional[List[str]] = None, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, sources: Optional[List[str]] = None) -> Optional[np.ndarray]:
+        self._flush()
+        selected = None
+        if usernames:
+            selected = self._union(f"user:{name.lower()}" for name in usernames)
+        if date_from or date_to:
+            low, high = (date_from or "0000-00")[:7], (date_to or "9999-99")[:7]
+            ids = self._union(f"month:{month}" for month in self.values("month") if low <= month <= high)
+            selected = ids if selected is None else np.intersect1d(selected, ids)
+        if sources:
+            ids = self._union(f"source:{source.lower()}" for source in sources)
+            selected = ids if selected is None else np.intersect1d(selected, ids)
+        return selected
+
+    def match_usernames(self, question: str) -> List[str]:
+        if self._aliases is None:
+            # Indexes saved before handles were kept only have the lower-cased usernames
+            self._aliases = name_aliases(self.handles or self.values("user"))
+        return match_names(question, self._aliases)
+
+    def save(self, folder_path: str) -> None:
+        self._flush()
+        np.savez(os.path.join(folder_path, METADATA_FILE), _handles=np.array(sorted(self.handles), dtype=str),
+                 **self.postings)
+
+    @classmethod
+    def load(cls, folder_path: str) -> "MetadataIndex":
+        path = os.path.join(folder_path, METADATA_FILE)
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            handles = list(data["_handles"]) if "_handles" in data.files else []
+            return cls({key: data[key] for key in data.files if key != "_handles"}, handles)
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import tempfile
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from lexical_index import tokenize
+from metadata_index import match_names, name_aliases
+
+SCORECARDS_FILE = "scorecards.npz"
+# Sorted 64-bit hashes of every row folded into the scorecards
+ROW_HASHES_FILE = "scorecard_rows.npy"
+
+# Keyword lists used to assign tweets to election topics. Topic 0, "all", holds every tweet.
+TOPICS = {
+    "economy": ["economy", "economic", "inflation", "jobs", "growth", "wages", "cost", "prices", "business", "budget"],
+    "tax": ["tax", "taxes", "vat", "taxation"],
+    "immigration": ["immigration", "migrants", "migration", "asylum", "border", "borders", "boats", "rwanda", "refugees"],
+    "health": ["nhs", "health", "hospital", "hospitals", "doctors", "nurses", "healthcare"],
+    "education": ["education", "school", "schools", "teachers", "university", "students"],
+    "housing": ["housing", "homes", "rent", "mortgage", "mortgages"],
+    "climate": ["climate", "energy", "net", "zero", "emissions", "green", "renewable"],
+    "crime": ["crime", "police", "policing", "justice", "prisons"],
+    "foreign_policy": ["ukraine", "israel", "gaza", "iran", "russia", "china", "nato", "war", "security"],
+    "defence": ["defence", "defense", "military", "armed", "forces", "veterans"],
+}
+TOPIC_NAMES = ["all"] + list(TOPICS)
+_topic_of = {word: i for i, words in enumerate(TOPICS.values(), 1) for word in words}
+
+def topics_for(text: str) -> List[int]:
+    return [0] + sorted({_topic_of[token] for token in tokenize(text) if token in _topic_of})
+
+# Engagement counts change between scrapes of the same tweet, so they are left out of
+# the row hash that decides whether a tweet was already folded in
+VOLATILE_FIELDS = tuple(f"{field}: " for field in ("likes", "retweets", "views", "reply_count"))
+
+def row_hash(text: str) -> int:
+    stable = "\n".join(line for line in text.split("\n") if not line.startswith(VOLATILE_FIELDS))
+    return int.from_bytes(hashlib.blake2b(stable.encode("utf-8"), digest_size=8).digest(), "little")
+
+def row_hashes(texts: Sequence[str]) -> np.ndarray:
+    return np.fromiter((row_hash(text) for text in texts), dtype=np.uint64, count=len(texts))
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+# Per-leader, per-topic, per-month sums of normalized tweet embeddings. Everything else
+# (centroids, the leader similarity matrix, consistency and drift) is derived from
+# these sums, so new tweets are folded in with update() without revisiting old ones.
+# Rows already folded in by an earlier corpus (the previous scrape) are skipped by hash.
+class Scorecards:
+    def __init__(self):
+        self.leaders: List[str] = []
+        # Each leader's username as written in the csv, used to resolve name fragments
+        self.handles: List[str] = []
+        self.months: List[str] = []
+        self._leader_ids: Dict[str, int] = {}
+        self._month_ids: Dict[str, int] = {}
+        self.cell_keys = np.empty((0, 3), dtype=np.int32)
+        self.cell_sums = None
+        self.cell_counts = np.empty(0, dtype=np.int64)
+        self._cells: Dict[tuple, int] = {}
+        self.similarity = None
+        # Hashes of rows folded in by earlier corpora (memory mapped) and by this one
+        self._seen = np.empty(0, dtype=np.uint64)
+        self._new_hashes: List[np.ndarray] = []
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self.cell_sums is None else self.cell_sums.shape[1]
+
+    def _id(self, names: List[str], ids: Dict[str, int], name: str) -> int:
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        return ids[name]
+
+    def _leader(self, handle: str) -> int:
+        if handle.lower() not in self._leader_ids:
+            self.handles.append(handle)
+        return self._id(self.leaders, self._leader_ids, handle.lower())
+
+    # Fold a batch of tweet vectors into the sums. metadatas carry the "usernames" and
+    # "months" lists written at ingest.
+    def update(self, vectors: np.ndarray, texts: Sequence[str], metadatas: Sequence[dict]) -> None:
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        hashes = row_hashes(texts)
+        self._new_hashes.append(hashes)
+        if len(self._seen):
+            found = np.minimum(np.searchsorted(self._seen, hashes), len(self._seen) - 1)
+            unseen = self._seen[found] != hashes
+        else:
+            unseen = np.ones(len(hashes), dtype=bool)
+        rows, keys = [], []
+        for row, (text, metadata) in enumerate(zip(texts, metadatas)):
+            if not unseen[row]:
+                continue
+            leaders = [self._leader(handle) for handle in metadata.get("handles") or metadata.get("usernames", [])]
+            months = [self._id(self.months, self._month_ids, month) for month in metadata.get("months", [])] or [-1]
+            topics = topics_for(text)
+            for leader in leaders:
+                for topic in topics:
+                    for month in months:
+                        rows.append(row)
+                        keys.append((leader, topic, month))
+        if not rows:
+            return
+
+        batch_keys, inverse = np.unique(np.array(keys, dtype=np.int32), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        batch_sums = np.zeros((len(batch_keys), vectors.shape[1]), dtype=np.float32)
+        np.add.at(batch_sums, inverse, vectors[np.array(rows)])
+        batch_counts = np.bincount(inverse, minlength=len(batch_keys))
+
+        if self.cell_sums is None:
+            self.cell_sums = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        positions = np.empty(len(batch_keys), dtype=np.int64)
+        new_keys = []
+        for i, key in enumerate(map(tuple, batch_keys.tolist())):
+            if key not in self._cells:
+                self._cells[key] = len(self._cells)
+                new_keys.append(key)
+            positions[i] = self._cells[key]
+        if new_keys:
+            self.cell_keys = np.vstack([self.cell_keys, np.array(new_keys, dtype=np.int32)])
+            self.cell_sums = np.vstack([self.cell_sums, np.zeros((len(new_keys), vectors.shape[1]), dtype=np.float32)])
+            self.cell_counts = np.concatenate([self.cell_counts, np.zeros(len(new_keys), dtype=np.int64)])
+        self.cell_sums[positions] += batch_sums
+        self.cell_counts[positions] += batch_counts
+        self.similarity = None
+
+    # Sums per (leader, topic) over all months, shape (leaders, topics, dim). Rows with
+    # several months are counted once per month; month -1 is the undated bucket.
+    def _topic_sums(self) -> np.ndarray:
+        sums = np.zeros((len(self.leaders), len(TOPIC_NAMES), self.cell_sums.shape[1]), dtype=np.float32)
+        np.add.at(sums, (self.cell_keys[:, 0], self.cell_keys[:, 1]), self.cell_sums)
+        return sums
+
+    def _topic_counts(self) -> np.ndarray:
+        counts = np.zeros((len(self.leaders), len(TOPIC_NAMES)), dtype=np.int64)
+        np.add.at(counts, (self.cell_keys[:, 0], self.cell_keys[:, 1]), self.cell_counts)
+        return counts
+
+    def _refresh(self) -> None:
+        if self.similarity is not None or self.cell_sums is None:
+            return
+        sums = self._topic_sums()
+        centroids = _normalize(sums).transpose(1, 0, 2)
+        self.similarity = centroids @ centroids.transpose(0, 2, 1)
+
+    # Resolve a handle or a name fragment, e.g. "Sunak" -> "rishisunak"
+    def leader(self, name: str) -> Optional[int]:
+        if name.lower() in self._leader_ids:
+            return self._leader_ids[name.lower()]
+        matches = match_names(name, name_aliases(self.handles))
+        return self._leader_ids[matches[0]] if len(matches) == 1 else None
+
+    def topic(self, name: str) -> int:
+        return TOPIC_NAMES.index(name) if name in TOPIC_NAMES else 0
+
+    def most_similar(self, leader: int, topic: int = 0, limit: int = 5) -> List[dict]:
+        self._refresh()
+        counts = self._topic_counts()
+        scores = self.similarity[topic, leader]
+        order = [i for i in np.argsort(-scores) if i != leader and counts[i, topic] > 0]
+        return [{"leader": self.leaders[i], "similarity": float(scores[i]), "tweets": int(counts[i, topic])}
+                for i in order[:limit]]
+
+    # Consistency is the count-weighted mean cosine between each month's centroid and the
+    # leader's overall centroid on the topic; drift is 1 - cosine between consecutive months.
+    def consistency(self, leader: int, topic: int = 0) -> dict:
+        mask = (self.cell_keys[:, 0] == leader) & (self.cell_keys[:, 1] == topic) & (self.cell_keys[:, 2] >= 0)
+        cells = np.flatnonzero(mask)
+        order = cells[np.argsort([self.months[m] for m in self.cell_keys[cells, 2]])]
+        if len(order) == 0:
+            return {"consistency": None, "tweets": 0, "months": []}
+        monthly = _normalize(self.cell_sums[order])
+        counts = self.cell_counts[order]
+        overall = _normalize(self.cell_sums[order].sum(axis=0))
+        agreement = monthly @ overall
+        drift = np.concatenate([[0.0], 1 - np.sum(monthly[1:] * monthly[:-1], axis=1)])
+        return {
+            "consistency": float(np.average(agreement, weights=counts)),
+            "tweets": int(counts.sum()),
+            "months": [
+                {"month": self.months[self.cell_keys[cell, 2]], "tweets": int(count),
+                 "agreement": float(score), "drift": float(change)}
+                for cell, count, score, change in zip(order, counts, agreement, drift)
+            ],
+        }
+
+    def save(self, folder_path: str) -> None:
+        if self.cell_sums is None:
+            return
+        self._refresh()
+        fd, tmp_path = tempfile.mkstemp(dir=folder_path, prefix=".tmp-", suffix=".npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                leaders=np.array(self.leaders, dtype=str),
+                handles=np.array(self.handles, dtype=str),
+                months=np.array(self.months, dtype=str),
+                topics=np.array(TOPIC_NAMES, dtype=str),
+                cell_keys=self.cell_keys,
+                cell_sums=self.cell_sums,
+                cell_counts=self.cell_counts,
+                similarity=self.similarity,
+            )
+        os.replace(tmp_path, os.path.join(folder_path, SCORECARDS_FILE))
+
+        hashes = np.unique(np.concatenate([self._seen] + self._new_hashes))
+        fd, tmp_path = tempfile.mkstemp(dir=folder_path, prefix=".tmp-", suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, hashes)
+        os.replace(tmp_path, os.path.join(folder_path, ROW_HASHES_FILE))
+
+    @classmethod
+    def load(cls, folder_path: str) -> Optional["Scorecards"]:
+        path = os.path.join(folder_path, SCORECARDS_FILE)
+        if not os.path.exists(path):
+            return None
+        scorecards = cls()
+        with np.load(path) as data:
+            if list(data["topics"]) != TOPIC_NAMES:
+                # Topic list changed since the artifact was built
+                return None
+            scorecards.leaders = list(data["leaders"])
+            scorecards.handles = list(data["handles"]) if "handles" in data.files else list(scorecards.leaders)
+            scorecards.months = list(data["months"])
+            scorecards.cell_keys = data["cell_keys"]
+            scorecards.cell_sums = data["cell_sums"]
+            scorecards.cell_counts = data["cell_counts"]
+            scorecards.similarity = data["similarity"]
+        scorecards._leader_ids = {name: i for i, name in enumerate(scorecards.leaders)}
+        scorecards._month_ids = {month: i for i, month in enumerate(scorecards.months)}
+        scorecards._cells = {key: i for i, key in enumerate(map(tuple, scorecards.cell_keys.tolist()))}
+        hashes_path = os.path.join(folder_path, ROW_HASHES_FILE)
+        if os.path.exists(hashes_path):
+            scorecards._seen = np.load(hashes_path, mmap_mode="r")
+        return scorecards
+
+# Batch job: compute scorecards from the vectors already stored in an index
+def build_from_store(store, batch_size: int = 10000) -> Scorecards:
+    scorecards = Scorecards()
+    total = len(store)
+    for start in range(0, total, batch_size):
+        vectors = store.vectors[start:start + batch_size]
+        documents = [store.document(i) for i in range(start, min(start + batch_size, total))]
+        scorecards.update(vectors, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
+    return scorecards
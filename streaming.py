@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from langchain.callbacks.streaming_aiter import AsyncIteratorCallbackHandler
+from langchain.chat_models import ChatOpenAI
+from langchain.schema import BaseMessage
+
+import tracing
+from context_packer import count_tokens
+from llm_pool import LLMPool, QueueFull
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Keeps the most recent latency samples and reports percentiles over them
+class LatencyRecorder:
+    def __init__(self, size: int = 1000):
+        self.samples = deque(maxlen=size)
+
+    def record(self, milliseconds: float) -> None:
+        self.samples.append(milliseconds)
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"count": 0}
+        values = np.fromiter(self.samples, dtype=np.float64)
+        return {
+            "count": len(values),
+            "p50_ms": float(np.percentile(values, 50)),
+            "p90_ms": float(np.percentile(values, 90)),
+            "p99_ms": float(np.percentile(values, 99)),
+        }
+
+# Yield completion tokens as the model produces them. If the consumer stops early
+# (for example because the client disconnected) the upstream request is cancelled.
+async def stream_tokens(llm: ChatOpenAI, messages: List[BaseMessage]) -> AsyncIterator[str]:
+    handler = AsyncIteratorCallbackHandler()
+    task = asyncio.create_task(llm.agenerate([messages], callbacks=[handler]))
+    try:
+        async for token in handler.aiter():
+            yield token
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
+
+# The same event sequence for an answer that is already known (a cached answer, or the
+# fixed reply when retrieval found no rows): early events, one "token", then "done"
+async def sse_known_answer(answer: str, ttft: LatencyRecorder, started: float,
+                           early_events: Iterable[Tuple[str, object]] = (), **done) -> AsyncIterator[str]:
+    for event, data in early_events:
+        yield sse(event, data)
+    first_token_ms = (time.perf_counter() - started) * 1000
+    ttft.record(first_token_ms)
+    yield sse("token", {"text": answer})
+    yield sse("done", {"time_to_first_token_ms": first_token_ms, "total_ms": first_token_ms, "tokens": 1, **done})
+
+# Server-sent event stream for one answer: any early events (such as the retrieved
+# references), then one "token" event per token, then a "done" event with timings.
+# started is the perf_counter() value taken when the request arrived.
+async def sse_answer(llm: ChatOpenAI, messages: List[BaseMessage], pool: LLMPool, ttft: LatencyRecorder,
+                     started: float, early_events: Iterable[Tuple[str, object]] = (),
+                     on_complete: Optional[Callable[[str], None]] = None) -> AsyncIterator[str]:
+    for event, data in early_events:
+        yield sse(event, data)
+
+    parts = []
+    first_token_ms = None
+    try:
+        async with pool.slot():
+            with tracing.stage("llm"):
+                async for token in stream_tokens(llm, messages):
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - started) * 1000
+                        ttft.record(first_token_ms)
+                    parts.append(token)
+                    yield sse("token", {"text": token})
+    except QueueFull as e:
+        yield sse("error", {"status": 429, "detail": str(e)})
+        return
+    except Exception as e:
+        tracing.record_error("stream", e)
+        yield sse("error", {"status": 500, "detail": str(e)})
+        return
+
+    answer = "".join(parts)
+    tracing.record_tokens(sum(count_tokens(message.content) for message in messages), count_tokens(answer))
+    if on_complete is not None:
+        # e.g. caching the answer, which hits sqlite and may embed the question
+        try:
+            await run_in_threadpool(on_complete, answer)
+        except Exception as e:
+            tracing.record_error("stream_complete", e)
+    yield sse("done", {
+        "time_to_first_token_ms": first_token_ms,
+        "total_ms": (time.perf_counter() - started) * 1000,
+        "tokens": len(parts),
+    })
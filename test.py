@@ -3,19 +3,42 @@ from pandasai import SmartDataframe
 from pandasai.llm import OpenAI
 from dotenv import load_dotenv
 import os
-import pandas as pd
+from dataset_cache import dataset_key, leader_partitions, load_dataset
 
 load_dotenv()
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-def chat_with_csv(df, prompt):
-    # Instantiate the LLM
+# Instantiate the LLM once and share it between sessions
+@st.cache_resource
+def get_llm():
+    return OpenAI(api_token=openai_api_key, model="gpt-4o", temperature=0, seed=26)
+
+# Parse each upload once; reruns reuse the Parquet-backed frame and its leader partitions
+@st.cache_resource
+def get_dataset(key, _data):
+    _, df = load_dataset(_data)
+    return df, leader_partitions(df)
+
+ALL_LEADERS = "All leaders"
+
+# One SmartDataframe per dataset and leader selection, reused across questions. Sessions
+# live in st.session_state so conversation memory is never shared between browser
+# sessions. The full table is used unless a leader is picked explicitly.
+def get_session(key, leader, df, partitions):
+    sessions = st.session_state.setdefault("sessions", {})
+    if (key, leader) not in sessions:
+        if leader != ALL_LEADERS:
+            df = df.iloc[partitions[leader]].reset_index(drop=True)
+        sessions[(key, leader)] = SmartDataframe(df, config = {
+        "llm": get_llm(),
+        "custom_whitelisted_dependencies": ["ast"]  # Add 'ast' here
+    })
+    return sessions[(key, leader)]
+
+def chat_with_csv(key, df, partitions, leader, prompt):
     # Convert to SmartDataframe
-    smart_df = SmartDataframe(df, config = {
-    "llm": OpenAI(api_token=openai_api_key, model="gpt-4o", temperature=0, seed=26),
-    "custom_whitelisted_dependencies": ["ast"]  # Add 'ast' here
-})
+    smart_df = get_session(key, leader, df, partitions)
 
     # Create a prompt template
     prompt_template = """
@@ -78,19 +101,22 @@ if input_csv is not None:
 
     with col1:
         st.info("CSV Uploaded Successfully")
-        data = pd.read_csv(input_csv)
+        csv_bytes = input_csv.getvalue()
+        key = dataset_key(csv_bytes)
+        data, partitions = get_dataset(key, csv_bytes)
         st.dataframe(data, use_container_width=True)
 
     with col2:
         st.info("Chat Below")
         
+        leader = st.selectbox("Leader", [ALL_LEADERS] + sorted(partitions))
         input_text = st.text_area("Enter your query")
 
         if input_text:
             if st.button("Chat with CSV"):
                 st.info("Your Query: " + input_text)
                 try:
-                    result = chat_with_csv(data, input_text)
+                    result = chat_with_csv(key, data, partitions, leader, input_text)
                     st.success(result)
                 except ValueError as e:
                     st.error(f"Error: {e}")
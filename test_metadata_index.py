@@ -0,0 +1,50 @@
+from metadata_index import match_names, name_aliases, name_parts, name_phrase
+
+HANDLES = [
+    "RishiSunak", "Keir_Starmer", "PeterObi", "PeterDutton_MP", "EFFSouthAfrica", "MYANC", "Julius_S_Malema",
+    "JDMahama", "realDonaldTrump", "theSNP", "skynewsbreak", "reformparty_uk", "UKLabour", "BorisJohnson",
+    "JohnsonLeader",
+]
+ALIASES = name_aliases(HANDLES)
+
+def test_name_parts_splits_camel_case_and_underscores():
+    assert name_parts("RishiSunak") == {"rishi", "sunak", "rishisunak"}
+    assert name_parts("Keir_Starmer") == {"keir", "starmer", "keir_starmer"}
+    assert name_parts("JDMahama") == {"mahama", "jdmahama"}
+
+def test_name_parts_drops_generic_place_and_common_words():
+    assert name_parts("EFFSouthAfrica") == {"eff", "effsouthafrica"}
+    assert name_parts("theSNP") == {"snp", "thesnp"}
+    assert name_parts("UKLabour") == {"uklabour"}
+    assert name_parts("PeterDutton_MP") == {"peter", "dutton", "peterdutton_mp"}
+    # Lower-cased handles cannot be split, so "news" never becomes a part
+    assert name_parts("skynewsbreak") == {"skynewsbreak"}
+
+def test_name_phrase():
+    assert name_phrase("PeterObi") == "peterobi"
+    assert name_phrase("PeterDutton_MP") == "peterdutton"
+    assert name_phrase("Julius_S_Malema") == "juliusmalema"
+    assert name_phrase("realDonaldTrump") == "donaldtrump"
+    assert name_phrase("MYANC") is None
+
+def test_match_names_single_words():
+    assert match_names("What did Sunak say?", ALIASES) == ["rishisunak"]
+    assert match_names("Sunak's and Starmer's plans on tax", ALIASES) == ["keir_starmer", "rishisunak"]
+    assert match_names("what about @Keir_Starmer", ALIASES) == ["keir_starmer"]
+    assert match_names("snp policy", ALIASES) == ["thesnp"]
+
+def test_match_names_prefers_adjacent_full_names():
+    assert match_names("What did Peter Obi say about tax?", ALIASES) == ["peterobi"]
+    assert match_names("Peter Dutton and Peter Obi on migration", ALIASES) == ["peterdutton_mp", "peterobi"]
+    assert match_names("Julius Malema on land", ALIASES) == ["julius_s_malema"]
+    assert match_names("Donald Trump on trade", ALIASES) == ["realdonaldtrump"]
+
+def test_match_names_skips_ambiguous_words_only():
+    assert match_names("what did Peter say", ALIASES) == []
+    assert match_names("Johnson and Obi on the economy", ALIASES) == ["peterobi"]
+
+def test_match_names_ignores_places_and_generic_words():
+    assert match_names("What is the ANC position on South Africa's economy?", ALIASES) == []
+    assert match_names("latest news on immigration", ALIASES) == []
+    assert match_names("the party", ALIASES) == []
+    assert match_names("labour policy on housing", ALIASES) == []
@@ -3,6 +3,8 @@ from langchain.chat_models import ChatOpenAI
 from langchain.prompts.chat import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from dotenv import load_dotenv
 import os
+from context_packer import ContextPacker
+from embedding_cache import get_embeddings
 
 # Load environment variables
 load_dotenv()
@@ -13,16 +15,24 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 # Initialize ChatOpenAI with the API key
 llm = ChatOpenAI(temperature=0, openai_api_key=openai_api_key, model="gpt-4o")
 
+# Create a prompt template for the chat model
+system_template = "You are an assistant that provides information based on the given {document}. Limit your responses to 250 words or less"
+system_message = SystemMessagePromptTemplate.from_template(system_template)
+human_message = HumanMessagePromptTemplate.from_template("{prompt}")
+
+chat_prompt = ChatPromptTemplate.from_messages([system_message, human_message])
+
+# Kept across Streamlit reruns so an uploaded document is only chunked and embedded once
+@st.cache_resource
+def get_context_packer():
+    return ContextPacker(get_embeddings())
+
 def chat_with_document(document_text, prompt):
     try:
-        # Create a prompt template for the chat model
-        system_message = SystemMessagePromptTemplate.from_template("You are an assistant that provides information based on the given {document}. Limit your responses to 250 words or less")
-        human_message = HumanMessagePromptTemplate.from_template("{prompt}")
-
-        chat_prompt = ChatPromptTemplate.from_messages([system_message, human_message])
+        context, _ = get_context_packer().pack(prompt, document_text, preamble=system_template)
 
         # Generate the response using the chat model
-        response = llm(chat_prompt.format_prompt(document=document_text, prompt=prompt).to_messages())
+        response = llm(chat_prompt.format_prompt(document=context, prompt=prompt).to_messages())
         return response.content
     except Exception as e:
         return f"Error: {e}"
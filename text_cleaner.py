@@ -1,24 +1,263 @@
-from bs4 import BeautifulSoup
-
-# Function to remove HTML tags
-def remove_html_tags(input_file, output_file):
-    # Read the input file
-    with open(input_file, 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    # Parse the HTML content
-    soup = BeautifulSoup(content, 'html.parser')
-    
-    # Get text without HTML tags
-    text = soup.get_text(separator="\n")
-    
-    # Write the text to the output file
-    with open(output_file, 'w', encoding='utf-8') as file:
-        file.write(text)
-
-# Specify input and output file paths
-input_file = './text.txt'
-output_file = './text_clean.txt'
-
-# Call the function
-remove_html_tags(input_file, output_file)
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Turn scraped newspaper pages into plain-text records ready for indexing, one record
+# per article container.
+#   python text_cleaner.py text.txt
+#   python text_cleaner.py ./scraped --output ./cleaned --workers 8
+
+READ_CHUNK_SIZE = 1024 * 1024
+MANIFEST_FILE = ".manifest.json"
+
+# Elements whose id or class marks the start of one article / page
+RECORD_MARKERS = {"documentText"}
+# Elements whose content is never text: scripts, styles, image cards and carousel chrome
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "img", "figure", "button", "nav"}
+SKIP_CLASSES = {"image-container", "glightbox", "swiper-pagination", "swiper-button-next", "swiper-button-prev"}
+BLOCK_TAGS = {"p", "div", "br", "h1", "h2", "h3", "h4", "h5", "h6", "li", "tr", "section", "article", "blockquote"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# A line repeated in at least this share of a file's records (and in at least
+# BOILERPLATE_MIN_RECORDS of them) is treated as masthead / footer boilerplate, e.g.
+# the issue date printed on every page
+BOILERPLATE_SHARE = 0.3
+BOILERPLATE_MIN_RECORDS = 3
+
+_image_extension = re.compile(r"\.(?:jpe?g|png|gif|webp|svg)\b", re.IGNORECASE)
+_image_path = re.compile(r"\S+\.(?:jpe?g|png|gif|webp|svg)\b", re.IGNORECASE)
+# Runs of blanks, or any single tab / non-breaking space; lone spaces are left alone
+_spaces = re.compile(r"[ \t\xa0]{2,}|[\t\xa0]")
+
+# Streaming parser: fed the file chunk by chunk, it keeps only the text of the current
+# record rather than building a document tree
+class RecordParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.records: List[Tuple[Optional[str], List[str]]] = []
+        self._stack: List[Tuple[str, bool, bool]] = []
+        self._skip_depth = 0
+        self._record_depth = None
+        self._title = None
+        # Stack depth of the open title heading, tracked like _skip_depth so child
+        # tags such as <h2><span>..</span></h2> stay part of the title
+        self._title_depth = None
+        self._title_parts: List[str] = []
+        self._parts: List[str] = []
+        self._outside: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get("class") or "").split())
+        skip = tag in SKIP_TAGS or bool(classes & SKIP_CLASSES)
+        record = attrs.get("id") in RECORD_MARKERS or bool(classes & RECORD_MARKERS)
+        if tag in VOID_TAGS:
+            self._break(tag)
+            return
+        if record and self._record_depth is None:
+            self._record_depth = len(self._stack)
+            self._title, self._parts = None, []
+        if (self._record_depth is not None and self._title is None and self._title_depth is None
+                and tag in {"h1", "h2", "h3"}):
+            self._title_depth, self._title_parts = len(self._stack), []
+        self._stack.append((tag, skip, record))
+        if skip:
+            self._skip_depth += 1
+        self._break(tag)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS or not any(open_tag == tag for open_tag, _, _ in self._stack):
+            return
+        # Close implicitly-closed children along with the tag
+        while self._stack:
+            open_tag, skip, _ = self._stack.pop()
+            if skip:
+                self._skip_depth -= 1
+            if self._title_depth is not None and len(self._stack) == self._title_depth:
+                self._close_title()
+            if self._record_depth is not None and len(self._stack) == self._record_depth:
+                self.records.append((self._title, self._parts))
+                self._record_depth, self._parts = None, []
+            if open_tag == tag:
+                break
+        self._break(tag)
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._title_depth is not None:
+            self._title_parts.append(data)
+            return
+        (self._parts if self._record_depth is not None else self._outside).append(data)
+
+    def _close_title(self):
+        self._title = " ".join("".join(self._title_parts).split()) or None
+        self._title_depth, self._title_parts = None, []
+
+    def _break(self, tag):
+        if tag in BLOCK_TAGS:
+            (self._parts if self._record_depth is not None else self._outside).append("\n")
+
+    def finish(self) -> List[Tuple[Optional[str], List[str]]]:
+        self.close()
+        if self._title_depth is not None:
+            self._close_title()
+        if self._record_depth is not None:
+            self.records.append((self._title, self._parts))
+        # Pages without any record container become a single record
+        if not self.records and "".join(self._outside).strip():
+            self.records.append((None, self._outside))
+        return self.records
+
+def _lines(parts: List[str]) -> List[str]:
+    text = "".join(parts)
+    # The path pattern backtracks on every word, so only run it when an image extension is present
+    if _image_extension.search(text):
+        text = _image_path.sub("", text)
+    text = _spaces.sub(" ", text)
+    return [line for line in map(str.strip, text.splitlines()) if line]
+
+# Drop lines that repeat across most records of the same file, e.g. a masthead phone
+# number or the printer's address in every page footer
+def strip_boilerplate(records: List[List[str]]) -> List[List[str]]:
+    if len(records) < BOILERPLATE_MIN_RECORDS:
+        return records
+    counts = Counter(line for lines in records for line in set(lines))
+    threshold = max(BOILERPLATE_MIN_RECORDS, BOILERPLATE_SHARE * len(records))
+    repeated = {line for line, count in counts.items() if count >= threshold}
+    return [[line for line in lines if line not in repeated] for lines in records]
+
+def iter_chunks(path: str, size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                break
+            yield chunk
+
+# Parse an html file into records of {"source", "record", "title", "text"}
+def clean_file(path: str) -> List[dict]:
+    parser = RecordParser()
+    for chunk in iter_chunks(path):
+        parser.feed(chunk)
+    parsed = parser.finish()
+    bodies = strip_boilerplate([_lines(parts) for _, parts in parsed])
+    records = []
+    for (title, _), lines in zip(parsed, bodies):
+        # A lone page number left over from the heading is not worth indexing
+        if lines and not (len(lines) == 1 and lines[0] == title):
+            records.append({"source": path, "record": len(records), "title": title, "text": "\n".join(lines)})
+    return records
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def output_path(path: str, root: str, output_dir: str, fmt: str) -> str:
+    relative = os.path.relpath(path, root) if os.path.isdir(root) else os.path.basename(path)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + f".{fmt}")
+
+def write_records(records: List[dict], path: str, fmt: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            if fmt == "jsonl":
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            else:
+                f.write(record["text"] + "\n\n")
+    os.replace(tmp_path, path)
+
+# Runs in a worker: hash the file and clean it unless it matches the digest recorded by
+# the last run and its output still exists. The record count is None for skipped files.
+def _process(task: Tuple[str, Optional[str], str, str]) -> Tuple[str, str, Optional[int], int]:
+    path, previous, target, fmt = task
+    digest = file_hash(path)
+    if digest == previous and os.path.exists(target):
+        return path, digest, None, os.path.getsize(path)
+    records = clean_file(path)
+    write_records(records, target, fmt)
+    return path, digest, len(records), os.path.getsize(path)
+
+def iter_inputs(root: str, extensions: Tuple[str, ...]) -> Iterator[str]:
+    if os.path.isfile(root):
+        yield root
+        return
+    for folder, _, names in os.walk(root):
+        for name in sorted(names):
+            if name.lower().endswith(extensions):
+                yield os.path.join(folder, name)
+
+def _load_manifest(output_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_manifest(output_dir: str, manifest: Dict[str, str]) -> None:
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+# Clean every file under root into output_dir across a process pool. Files whose
+# content hash matches the last run and whose output still exists are skipped; the
+# hashing happens in the workers too.
+def clean_directory(root: str, output_dir: str, workers: Optional[int] = None, fmt: str = "jsonl",
+                    extensions: Tuple[str, ...] = (".html", ".htm", ".txt"), force: bool = False) -> dict:
+    started = time.perf_counter()
+    manifest = {} if force else _load_manifest(output_dir)
+    output_root = os.path.abspath(output_dir) + os.sep
+    tasks = [(path, manifest.get(path), output_path(path, root, output_dir, fmt), fmt)
+             for path in iter_inputs(root, extensions) if not os.path.abspath(path).startswith(output_root)]
+
+    files, skipped, records, processed_bytes, skipped_bytes = 0, 0, 0, 0, 0
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, digest, count, size in pool.map(_process, tasks, chunksize=max(1, len(tasks) // 64)):
+                if count is None:
+                    skipped += 1
+                    skipped_bytes += size
+                    continue
+                manifest[path] = digest
+                files += 1
+                records += count
+                processed_bytes += size
+        if files:
+            _save_manifest(output_dir, manifest)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "files": files,
+        "skipped": skipped,
+        "records": records,
+        "megabytes": processed_bytes / 1e6,
+        "skipped_megabytes": skipped_bytes / 1e6,
+        "seconds": elapsed,
+        "mb_per_second": processed_bytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean scraped html pages into text records")
+    parser.add_argument("input", nargs="?", default="./text.txt", help="file or directory to clean")
+    parser.add_argument("--output", default="./cleaned", help="directory for the cleaned records")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the cpu count")
+    parser.add_argument("--format", choices=("jsonl", "txt"), default="jsonl")
+    parser.add_argument("--force", action="store_true", help="reprocess files even if unchanged")
+    args = parser.parse_args()
+    print(json.dumps(clean_directory(args.input, args.output, args.workers, args.format, force=args.force), indent=2))
+
+if __name__ == "__main__":
+    main()
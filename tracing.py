@@ -0,0 +1,251 @@
+import contextlib
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as TallyCounter, deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Match
+
+logger = logging.getLogger("kyl.tracing")
+
+# Opt-in sampling profiler: when PROFILE_SLOW_MS is set, stacks of every thread are
+# sampled every PROFILE_INTERVAL_MS and requests slower than the threshold write the
+# samples taken while they ran to PROFILE_DIR in collapsed-stack (flamegraph) format
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+IDLE_FILES = {"threading.py", "queue.py", "selectors.py"}
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# Minimal Prometheus metrics rendered in the text exposition format. Values are kept
+# per process; each worker serves its own /metrics.
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self._header() + [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in values.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    # (count, sum) per label set
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        with self._lock:
+            return {k: (sum(counts), total) for k, (counts, total) in self._values.items()}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {k: (list(counts), total) for k, (counts, total) in self._values.items()}
+        lines = self._header()
+        names = self.label_names + ("le",)
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(names, key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+# A gauge or counter whose values are read from a callback at scrape time, for state
+# that is already tracked elsewhere (cache stats, index size)
+class Collected(Metric):
+    def __init__(self, name: str, help: str, kind: str, fn: Callable[[], Dict[Tuple[str, ...], float]],
+                 labels: Iterable[str] = ()):
+        self.kind = kind
+        self.fn = fn
+        super().__init__(name, help, labels)
+
+    def render(self) -> List[str]:
+        try:
+            values = self.fn()
+        except Exception:
+            logger.exception("Collecting %s failed", self.name)
+            return []
+        return self._header() + [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in values.items()]
+
+REGISTRY: List[Metric] = []
+
+stage_seconds = Histogram("kyl_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+stage_errors = Counter("kyl_stage_errors_total", "Exceptions raised inside a pipeline stage", ["stage", "error"])
+request_seconds = Histogram("kyl_request_seconds", "HTTP request latency", ["method", "route", "status"])
+handled_errors = Counter("kyl_handled_errors_total", "Exceptions turned into error responses", ["where", "error"])
+llm_tokens = Counter("kyl_llm_tokens_total", "Prompt and completion tokens sent to and received from the LLM",
+                     ["kind"])
+
+def collect(name: str, help: str, fn: Callable[[], Dict[Tuple[str, ...], float]], labels: Iterable[str] = (),
+            kind: str = "gauge") -> Collected:
+    return Collected(name, help, kind, fn, labels)
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+# Stage timings of the request being served, used when reporting slow requests
+_trace: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("trace", default=None)
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        stage_errors.inc(name, type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, name)
+        trace = _trace.get()
+        if trace is not None:
+            trace[name] = trace.get(name, 0.0) + elapsed
+
+# Time how long each item of an iterator takes to produce, e.g. rows parsed from a csv
+def timed_iter(iterable: Iterable, name: str) -> Iterator:
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+def record_tokens(prompt_tokens: int, completion_tokens: int) -> None:
+    llm_tokens.inc("prompt", amount=prompt_tokens)
+    llm_tokens.inc("completion", amount=completion_tokens)
+
+# Log an exception that is turned into an error response, so the traceback is not lost
+def record_error(where: str, error: Exception) -> None:
+    handled_errors.inc(where, type(error).__name__)
+    logger.error("%s failed", where, exc_info=error)
+
+class SamplingProfiler:
+    def __init__(self, interval: float, retention: float = 120.0):
+        self.interval = interval
+        # One entry per tick holding the stacks of every thread at that moment
+        self.samples = deque(maxlen=max(1, int(retention / interval)))
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            now = time.perf_counter()
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                # Skip this thread and threads parked on a lock, queue or selector
+                if thread_id == own or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(stack)))
+            self.samples.append((now, stacks))
+            time.sleep(self.interval)
+
+    def collapsed(self, started: float, finished: float) -> Dict[str, int]:
+        return TallyCounter(stack for at, stacks in list(self.samples) if started <= at <= finished for stack in stacks)
+
+    def dump(self, route: str, started: float, finished: float, trace: Dict[str, float]) -> Optional[str]:
+        stacks = self.collapsed(started, finished)
+        if not stacks:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = route.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{int((finished - started) * 1000)}ms.txt")
+        with open(path, "w") as f:
+            f.write(f"# {route} {(finished - started) * 1000:.1f}ms stages={trace}\n")
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000) if PROFILE_SLOW_MS > 0 else None
+
+def _route(app: FastAPI, request: Request) -> str:
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+# Time every request, expose /metrics, and hand slow requests to the profiler
+def instrument(app: FastAPI) -> None:
+    @app.middleware("http")
+    async def trace_requests(request: Request, call_next):
+        started = time.perf_counter()
+        trace = {}
+        token = _trace.set(trace)
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            _trace.reset(token)
+            finished = time.perf_counter()
+            route = _route(app, request)
+            # Streaming responses are timed up to the first byte
+            request_seconds.observe(finished - started, request.method, route, str(status))
+            if profiler is not None and (finished - started) * 1000 >= PROFILE_SLOW_MS:
+                path = profiler.dump(route, started, finished, trace)
+                logger.warning("Slow request %s %s %.1fms stages=%s profile=%s",
+                               request.method, route, (finished - started) * 1000, trace, path)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")